@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""End-to-end benchmark of main.update_mods against a local stand-in mod server.
+
+Generates a synthetic modfiles/{common,client,clientadditional} tree (mods.toml, ${file.jarVersion}
+with MANIFEST.MF, loader.properties pinned jars and jarjar kffmod jars, split mods.zip parts),
+serves it over HTTP and measures cold install, warm no-op, warm full reconcile and N-mods-changed
+runs. Each run happens headless (--yes) in a fresh subprocess and reports wall time, bytes served,
+peak RSS and the number of zip archives opened.
+
+    python benchmarks/bench_update.py --mods 300 --changed 10
+"""
+import argparse
+import http.server
+import io
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+ENVIRONMENTS = ("common", "client", "clientadditional")
+MOD_KINDS = ("toml", "manifest", "pinned", "jarjar")
+
+
+def mods_toml(mod_id, version):
+    return (
+        'modLoader="javafml"\nloaderVersion="[47,)"\nlicense="MIT"\n\n'
+        f'[[mods]]\nmodId="{mod_id}"\nversion="{version}"\ndisplayName="{mod_id}"\n'
+        "description='''\n" + "A synthetic mod used for benchmarking.\n" * 20 + "'''\n\n"
+        f'[[dependencies.{mod_id}]]\nmodId="forge"\nmandatory=true\nversionRange="[47,)"\nordering="NONE"\nside="BOTH"\n'
+    )
+
+
+def build_jar(mod_id, version, kind, payload_size, rng):
+    """Return the bytes of a synthetic mod JAR of the given metadata kind."""
+    def inner_jar():
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as inner:
+            inner.writestr("META-INF/mods.toml", mods_toml(mod_id, version))
+            inner.writestr(f"{mod_id}/Main.class", rng.randbytes(max(1, payload_size // 2)))
+        return buffer.getvalue()
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as jar:
+        if kind == "toml":
+            jar.writestr("META-INF/mods.toml", mods_toml(mod_id, version))
+        elif kind == "manifest":
+            jar.writestr("META-INF/mods.toml", mods_toml(mod_id, "${file.jarVersion}"))
+            jar.writestr("META-INF/MANIFEST.MF", f"Manifest-Version: 1.0\nImplementation-Version: {version}\n")
+        elif kind == "pinned":
+            jar.writestr("META-INF/loader.properties", f"pinnedFile=/META-INF/jars/{mod_id}-inner.jar\n")
+            jar.writestr(zipfile.ZipInfo(f"META-INF/jars/{mod_id}-inner.jar"), inner_jar(), zipfile.ZIP_STORED)
+        elif kind == "jarjar":
+            metadata = {"jars": [{"identifier": {"group": "bench", "artifact": "kffmod"}, "path": f"META-INF/jarjar/{mod_id}-kffmod.jar"}]}
+            jar.writestr("META-INF/jarjar/metadata.json", json.dumps(metadata))
+            jar.writestr(zipfile.ZipInfo(f"META-INF/jarjar/{mod_id}-kffmod.jar"), inner_jar(), zipfile.ZIP_STORED)
+        # Incompressible class data so sizes and transfer volumes are realistic
+        jar.writestr(f"{mod_id}/Payload.class", rng.randbytes(payload_size))
+    return buffer.getvalue()
+
+
+def generate_tree(root, mod_count, mod_size_kb, zip_part_mb, seed):
+    """Write modfiles/<env>/ (JARs, modlist.txt, mods.zip parts) and modfiles/forceupdate.txt under root."""
+    rng = random.Random(seed)
+    modfiles = os.path.join(root, "modfiles")
+    mods = {environment: [] for environment in ENVIRONMENTS}
+    for index in range(mod_count):
+        environment = ENVIRONMENTS[0] if index % 5 < 3 else ENVIRONMENTS[1 + index % 2]
+        mods[environment].append((f"benchmod{index}", MOD_KINDS[index % len(MOD_KINDS)]))
+
+    for environment, entries in mods.items():
+        os.makedirs(os.path.join(modfiles, environment), exist_ok=True)
+        for mod_id, kind in entries:
+            payload_size = int(rng.uniform(0.25, 1.75) * mod_size_kb * 1024)
+            write_mod(modfiles, environment, mod_id, "1.0.0", kind, payload_size, rng)
+        write_modlist(modfiles, environment)
+        write_zip_parts(modfiles, environment, zip_part_mb * 1024 * 1024)
+
+    with open(os.path.join(modfiles, "forceupdate.txt"), "w") as force_update_file:
+        force_update_file.write("benchmod0 initialsequence\nbenchmod1 initialsequence\n")
+    return mods
+
+
+def write_mod(modfiles, environment, mod_id, version, kind, payload_size, rng):
+    jar_path = os.path.join(modfiles, environment, f"{mod_id}-{version}.jar")
+    with open(jar_path, "wb") as jar_file:
+        jar_file.write(build_jar(mod_id, version, kind, payload_size, rng))
+    with open(os.path.join(modfiles, environment, f".{mod_id}.kind"), "w") as kind_file:
+        kind_file.write(f"{kind} {payload_size}")
+
+
+def write_modlist(modfiles, environment):
+    folder = os.path.join(modfiles, environment)
+    lines = []
+    for filename in sorted(os.listdir(folder)):
+        match = re.fullmatch(r"(benchmod\d+)-(.+)\.jar", filename)
+        if match:
+            lines.append(f"{match.group(1)} {match.group(2)} {filename}")
+    with open(os.path.join(folder, "modlist.txt"), "w") as modlist_file:
+        modlist_file.write("\n".join(lines) + "\n")
+
+
+def write_zip_parts(modfiles, environment, part_size):
+    folder = os.path.join(modfiles, environment)
+    for filename in os.listdir(folder):
+        if filename.endswith(".zip"):
+            os.remove(os.path.join(folder, filename))
+    parts = [[]]
+    current_size = 0
+    for filename in sorted(f for f in os.listdir(folder) if f.endswith(".jar")):
+        size = os.path.getsize(os.path.join(folder, filename))
+        if parts[-1] and current_size + size > part_size:
+            parts.append([])
+            current_size = 0
+        parts[-1].append(filename)
+        current_size += size
+    for index, part in enumerate(parts):
+        zip_name = "mods.zip" if index == 0 else f"mods{index}.zip"
+        with zipfile.ZipFile(os.path.join(folder, zip_name), "w", zipfile.ZIP_STORED) as zip_file:
+            for filename in part:
+                zip_file.write(os.path.join(folder, filename), filename)
+
+
+def bump_mods(root, mods, count, zip_part_mb, seed):
+    """Publish a new version of `count` mods and rebuild the affected modlists and zip parts."""
+    rng = random.Random(seed)
+    modfiles = os.path.join(root, "modfiles")
+    changed_environments = set()
+    bumped = 0
+    for environment, entries in mods.items():
+        for mod_id, _ in entries:
+            if bumped >= count:
+                break
+            folder = os.path.join(modfiles, environment)
+            old_jar = next(f for f in os.listdir(folder) if re.fullmatch(rf"{mod_id}-.+\.jar", f))
+            version = old_jar[len(mod_id) + 1:-len(".jar")]
+            new_version = f"{version}.1"
+            with open(os.path.join(folder, f".{mod_id}.kind")) as kind_file:
+                kind, payload_size = kind_file.read().split()
+            os.remove(os.path.join(folder, old_jar))
+            write_mod(modfiles, environment, mod_id, new_version, kind, int(payload_size), rng)
+            changed_environments.add(environment)
+            bumped += 1
+    for environment in changed_environments:
+        write_modlist(modfiles, environment)
+        write_zip_parts(modfiles, environment, zip_part_mb * 1024 * 1024)
+
+
+class TrafficCounter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bytes_sent = 0
+        self.requests = 0
+
+    def snapshot(self):
+        with self.lock:
+            return self.bytes_sent, self.requests
+
+
+class CountingWriter:
+    def __init__(self, stream, counter):
+        self.stream = stream
+        self.counter = counter
+
+    def write(self, data):
+        with self.counter.lock:
+            self.counter.bytes_sent += len(data)
+        return self.stream.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def make_handler(root, counter):
+    class StandInHandler(http.server.SimpleHTTPRequestHandler):
+        """Static file handler with keep-alive, single-range requests and traffic counting."""
+        protocol_version = "HTTP/1.1"
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=root, **kwargs)
+
+        def setup(self):
+            super().setup()
+            self.wfile = CountingWriter(self.wfile, counter)
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_head(self):
+            with counter.lock:
+                counter.requests += 1
+            range_header = self.headers.get("Range")
+            path = self.translate_path(self.path)
+            match = re.fullmatch(r"bytes=(\d+)-", range_header or "")
+            if not match or not os.path.isfile(path):
+                return super().send_head()
+            if_range = self.headers.get("If-Range")
+            if if_range and if_range != self.date_time_string(int(os.path.getmtime(path))):
+                return super().send_head()  # The file changed since the partial download started
+            size = os.path.getsize(path)
+            start = int(match.group(1))
+            if start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return None
+            source = open(path, "rb")
+            source.seek(start)
+            self.send_response(206)
+            self.send_header("Content-Type", self.guess_type(path))
+            self.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+            self.send_header("Content-Length", str(size - start))
+            self.end_headers()
+            return source
+
+    return StandInHandler
+
+
+class StandInServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Pooled client connections are dropped when the updater process exits
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_server(root, counter):
+    server = StandInServer(("127.0.0.1", 0), make_handler(root, counter))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_child(instance_path):
+    """Run main.update_mods headless inside this process and print a JSON result line."""
+    sys.path.insert(0, REPO_PATH)
+    import jar_reader
+    zip_opens = [0]
+
+    def count_opens(archive_class):
+        original_init = archive_class.__init__
+
+        def counting_init(self, *args, **kwargs):
+            zip_opens[0] += 1
+            original_init(self, *args, **kwargs)
+
+        archive_class.__init__ = counting_init
+
+    count_opens(zipfile.ZipFile)
+    count_opens(jar_reader.JarReader)
+
+    import main
+    real_stdout = sys.stdout
+    sys.stdout = open(os.path.join(instance_path, "updater_output.log"), "a")
+    start = time.perf_counter()
+    exit_code = main.main(["--yes", "--mods", os.path.join(instance_path, "mods"),
+                           "--config", os.path.join(instance_path, "modupdaterconfig.json")])
+    wall_time = time.perf_counter() - start
+    sys.stdout.close()
+    sys.stdout = real_stdout
+
+    try:
+        import resource
+        peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == "darwin":
+            peak_rss_kb //= 1024
+    except ImportError:
+        peak_rss_kb = None
+    print(json.dumps({"wall_time": wall_time, "exit_code": exit_code, "peak_rss_kb": peak_rss_kb, "zip_opens": zip_opens[0]}))
+
+
+def run_scenario(name, instance_path, counter):
+    bytes_before, requests_before = counter.snapshot()
+    completed = subprocess.run([sys.executable, os.path.realpath(__file__), "--child", instance_path],
+                               capture_output=True, text=True, check=True)
+    bytes_after, requests_after = counter.snapshot()
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    if result["exit_code"] != 0:
+        print(f"Warning: scenario \"{name}\" exited with code {result['exit_code']}")
+    result.update({"scenario": name, "bytes": bytes_after - bytes_before, "requests": requests_after - requests_before})
+    return result
+
+
+def print_table(results):
+    header = f"{'scenario':<20}{'wall (s)':>10}{'MiB sent':>10}{'requests':>10}{'peak RSS (MiB)':>16}{'zip opens':>11}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        rss = f"{result['peak_rss_kb'] / 1024:.1f}" if result["peak_rss_kb"] is not None else "n/a"
+        print(f"{result['scenario']:<20}{result['wall_time']:>10.3f}{result['bytes'] / 1048576:>10.2f}{result['requests']:>10}{rss:>16}{result['zip_opens']:>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mods", type=int, default=200, help="number of synthetic mods (default: 200)")
+    parser.add_argument("--mod-size-kb", type=int, default=256, help="average payload per JAR in KiB (default: 256)")
+    parser.add_argument("--zip-part-mb", type=int, default=16, help="size cap of each mods.zip part in MiB (default: 16)")
+    parser.add_argument("--changed", type=int, default=10, help="mods bumped in the N-changed scenario (default: 10)")
+    parser.add_argument("--scan-workers", type=int, default=1, help="scanWorkers for the updater; zip opens are only counted in-process (default: 1)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON to PATH")
+    parser.add_argument("--keep", action="store_true", help="keep the generated tree and instance folder")
+    parser.add_argument("--child", metavar="INSTANCE", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child)
+        return
+
+    work_path = tempfile.mkdtemp(prefix="modupdater-bench-")
+    server_root = os.path.join(work_path, "server")
+    instance_path = os.path.join(work_path, "instance")
+    os.makedirs(instance_path)
+    try:
+        print(f"Generating {args.mods} mods in {server_root}...")
+        mods = generate_tree(server_root, args.mods, args.mod_size_kb, args.zip_part_mb, args.seed)
+        counter = TrafficCounter()
+        server = start_server(server_root, counter)
+        config = {
+            "url": f"http://127.0.0.1:{server.server_address[1]}",
+            "scanWorkers": args.scan_workers,
+            "modStorePath": os.path.join(work_path, "modstore"),
+        }
+        with open(os.path.join(instance_path, "modupdaterconfig.json"), "w") as config_file:
+            json.dump(config, config_file, indent=4)
+
+        results = [run_scenario("cold install", instance_path, counter)]
+        results.append(run_scenario("warm no-op", instance_path, counter))
+        os.remove(os.path.join(instance_path, "pack_state.json"))
+        results.append(run_scenario("warm reconcile", instance_path, counter))
+        bump_mods(server_root, mods, args.changed, args.zip_part_mb, args.seed + 1)
+        results.append(run_scenario(f"{args.changed} mods changed", instance_path, counter))
+        server.shutdown()
+
+        print_table(results)
+        if args.json:
+            with open(args.json, "w") as json_file:
+                json.dump(results, json_file, indent=4)
+    finally:
+        if args.keep:
+            print(f"Kept benchmark files in {work_path}")
+        else:
+            shutil.rmtree(work_path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+import os
+import json
+import uuid
+import shutil
+import contextlib
+
+@contextlib.contextmanager
+def atomic_path(path):
+    """Yield a temporary path next to path and move it over path once the block succeeds.
+
+    The temporary name is unique, so concurrent writers (threads or other instances) never share one;
+    on failure it is removed and path is left as it was.
+    """
+    temp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+
+def write_text_atomically(path, text):
+    """Replace path with text, written with \\n line endings."""
+    with atomic_path(path) as temp_path:
+        with open(temp_path, "w", newline="\n") as output_file:
+            output_file.write(text)
+
+def write_json_atomically(path, data):
+    """Replace path with data as indented JSON."""
+    with atomic_path(path) as temp_path:
+        with open(temp_path, "w") as json_file:
+            json.dump(data, json_file, indent=4)
+
+def link_or_copy(source_path, target_path):
+    """Replace target_path with a hardlink of source_path, or with a copy keeping its mtime where linking is not possible.
+
+    Either way the target has the size and mtime of the source, which is what the installed mod index keys on.
+    """
+    with atomic_path(target_path) as temp_path:
+        try:
+            os.link(source_path, temp_path)
+        except OSError:
+            shutil.copy2(source_path, temp_path)
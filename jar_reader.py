@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+import os
+import mmap
+import zlib
+import struct
+import collections
+
+END_OF_CENTRAL_DIRECTORY = struct.Struct("<4s4H2LH")
+CENTRAL_DIRECTORY_HEADER = struct.Struct("<4s6H3L5H2L")
+LOCAL_FILE_HEADER = struct.Struct("<4s5H3L2H")
+END_OF_CENTRAL_DIRECTORY_SIGNATURE = b"PK\x05\x06"
+CENTRAL_DIRECTORY_SIGNATURE = b"PK\x01\x02"
+LOCAL_FILE_SIGNATURE = b"PK\x03\x04"
+MAX_COMMENT_SIZE = 0xFFFF
+ZIP64_LIMIT = 0xFFFFFFFF
+
+METHOD_STORED = 0
+METHOD_DEFLATED = 8
+
+# The zipfile.ZipInfo attributes the mod scan uses
+JarEntry = collections.namedtuple("JarEntry", ["filename", "CRC", "file_size", "compress_size", "compress_type"])
+
+class JarFormatError(Exception):
+    """Raised for archives this reader does not handle (ZIP64, encryption, other compression); use zipfile instead."""
+
+class JarReader:
+    """Read-only JAR reader over a memory map (or any buffer) that parses the central directory once.
+
+    Entries are read straight from the mapped bytes. A STORED nested jar is opened as a
+    memoryview slice of its parent, so reading its mods.toml copies and inflates only that entry.
+    Supports the read(name) / namelist() / getinfo(name) subset of zipfile.ZipFile used by the mod scan.
+    """
+
+    def __init__(self, source):
+        self._file = None
+        self._mmap = None
+        if isinstance(source, (str, os.PathLike)):
+            self._file = open(source, "rb")
+            try:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:  # Empty file
+                self._file.close()
+                raise JarFormatError(f"Cannot map {source}: {e}")
+            self._view = memoryview(self._mmap)
+        else:
+            self._view = source if isinstance(source, memoryview) else memoryview(source)
+        try:
+            self._entries = self._read_central_directory()
+        except BaseException:
+            self.close()
+            raise
+
+    def _read_central_directory(self):
+        view = self._view
+        search_start = max(0, len(view) - MAX_COMMENT_SIZE - END_OF_CENTRAL_DIRECTORY.size)
+        end_offset = bytes(view[search_start:]).rfind(END_OF_CENTRAL_DIRECTORY_SIGNATURE)
+        if end_offset < 0:
+            raise JarFormatError("End of central directory not found")
+        end_offset += search_start
+        (_, _, _, _, entry_count, directory_size, directory_offset, _) = END_OF_CENTRAL_DIRECTORY.unpack_from(view, end_offset)
+        if entry_count == 0xFFFF or directory_offset == ZIP64_LIMIT:
+            raise JarFormatError("ZIP64 archive")
+        # Bytes prepended to the archive shift every offset, as zipfile accounts for too
+        shift = end_offset - directory_size - directory_offset
+        if shift < 0:
+            raise JarFormatError("Invalid central directory offset")
+
+        entries = {}
+        position = directory_offset + shift
+        for _ in range(entry_count):
+            (signature, _, _, flags, method, _, _, crc, compressed_size, size, name_length, extra_length,
+             comment_length, _, _, _, header_offset) = CENTRAL_DIRECTORY_HEADER.unpack_from(view, position)
+            if signature != CENTRAL_DIRECTORY_SIGNATURE:
+                raise JarFormatError("Bad central directory entry")
+            position += CENTRAL_DIRECTORY_HEADER.size
+            name = bytes(view[position:position + name_length]).decode("utf-8" if flags & 0x800 else "cp437")
+            position += name_length + extra_length + comment_length
+            if ZIP64_LIMIT in (compressed_size, size, header_offset):
+                raise JarFormatError(f"ZIP64 entry {name}")
+            entries[name] = (flags, method, crc, compressed_size, size, header_offset + shift)
+        return entries
+
+    def namelist(self):
+        return list(self._entries)
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def getinfo(self, name):
+        flags, method, crc, compressed_size, size, header_offset = self._entries[name]
+        return JarEntry(name, crc, size, compressed_size, method)
+
+    def _entry_data(self, name):
+        """Return (memoryview of the raw entry bytes, method, crc, size)."""
+        flags, method, crc, compressed_size, size, header_offset = self._entries[name]
+        if flags & 0x1:
+            raise JarFormatError(f"Encrypted entry {name}")
+        (signature, _, _, _, _, _, _, _, _, name_length, extra_length) = LOCAL_FILE_HEADER.unpack_from(self._view, header_offset)
+        if signature != LOCAL_FILE_SIGNATURE:
+            raise JarFormatError(f"Bad local header for {name}")
+        start = header_offset + LOCAL_FILE_HEADER.size + name_length + extra_length
+        if start + compressed_size > len(self._view):
+            raise JarFormatError(f"Truncated entry {name}")
+        return self._view[start:start + compressed_size], method, crc, size
+
+    def read(self, name):
+        """Return the uncompressed bytes of an entry, checking its CRC-32; raises KeyError for a missing entry."""
+        data, method, crc, size = self._entry_data(name)
+        with data:
+            if method == METHOD_STORED:
+                content = bytes(data)
+            elif method == METHOD_DEFLATED:
+                content = zlib.decompress(data, -zlib.MAX_WBITS, max(size, 1))
+            else:
+                raise JarFormatError(f"Unsupported compression method {method} for {name}")
+        if len(content) != size or zlib.crc32(content) != crc:
+            raise JarFormatError(f"CRC or size mismatch for {name}")
+        return content
+
+    def open_nested(self, name):
+        """Open a jar stored inside this one: a zero-copy slice when STORED, otherwise inflated once into memory."""
+        data, method, _, _ = self._entry_data(name)
+        if method == METHOD_STORED:
+            return JarReader(data)
+        data.release()
+        return JarReader(self.read(name))
+
+    def close(self):
+        self._view.release()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass  # A slice is still referenced (e.g. by a traceback); the map is freed with it
+            self._file.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,7 +1,16 @@
 #!/usr/bin/env python3
 import os
 import sys
+import json
+import time
+import argparse
+import contextlib
+import subprocess
+import multiprocessing
 import mod_updater_core as core
+import update_planner as planner
+import staged_update as staged
+import profiling
 import colored_prints as colored
 import warnings
 warnings.filterwarnings("ignore", message="pkg_resources is deprecated*")
@@ -16,25 +25,61 @@ else:
     
 LOCAL_MODS_PATH = os.path.join(base_path, "mods")
 FORCE_UPDATE_LOG_PATH = os.path.join(base_path, "cloud_forced_update_log.json")
+INSTALLED_INDEX_PATH = os.path.join(base_path, "installed_mods_index.json")
+HTTP_CACHE_PATH = os.path.join(base_path, "modlist_http_cache.json")
+PACK_STATE_PATH = os.path.join(base_path, "pack_state.json")
 
 DEFAULT_CONFIG = {
     "url": "",
     "updateAll": False,
     "optionalMods": True,
     "useVersionChecking": True,
+    "indexContentHash": False,
+    "scanWorkers": 0,
+    "downloadWorkers": 8,
+    "downloadRetries": 3,
+    "useModStore": True,
+    "modStorePath": "",
+    "modStoreMaxSizeMB": 4096,
+    "maxBandwidth": 0,
 }
 CONFIG_FILE_PATH = os.path.join(base_path, "modupdaterconfig.json")
 
-def update_mods():
-    """Update mods while keeping client-side mods intact."""
-    config = core.load_config(CONFIG_FILE_PATH, DEFAULT_CONFIG)
+def set_instance_paths(mods_path):
+    """Use mods_path as mods folder and keep the updater state files in its parent (instance) folder."""
+    global LOCAL_MODS_PATH, FORCE_UPDATE_LOG_PATH, INSTALLED_INDEX_PATH, HTTP_CACHE_PATH, PACK_STATE_PATH
+    LOCAL_MODS_PATH = os.path.abspath(mods_path)
+    instance_path = os.path.dirname(LOCAL_MODS_PATH)
+    FORCE_UPDATE_LOG_PATH = os.path.join(instance_path, "cloud_forced_update_log.json")
+    INSTALLED_INDEX_PATH = os.path.join(instance_path, "installed_mods_index.json")
+    HTTP_CACHE_PATH = os.path.join(instance_path, "modlist_http_cache.json")
+    PACK_STATE_PATH = os.path.join(instance_path, "pack_state.json")
+
+def save_pack_state(cloud_mods, config):
+    """Remember the pack state after a successful run so the next one can skip or apply only the changes."""
+    if config.get("updateAll", False):
+        return
+    core.save_pack_state(PACK_STATE_PATH, cloud_mods, core.cached_cloud_force_update_list, LOCAL_MODS_PATH, config)
+
+def update_mods(dry_run=False):
+    """Update mods while keeping client-side mods intact. With dry_run, only print what would change.
+
+    Returns a result dict with "status", "exit_code", the plan summary and the failed files.
+    """
+    result = {"status": "", "exit_code": core.EXIT_OK, "dry_run": dry_run, "mods_path": LOCAL_MODS_PATH, "plan": None, "failed": []}
+    with profiling.span("load config", "phase"):
+        config = core.load_config(CONFIG_FILE_PATH, DEFAULT_CONFIG)
     print(f"Current config: {config}")
 
     if os.path.exists(LOCAL_MODS_PATH):
         print(f"Using mods folder: {LOCAL_MODS_PATH}")
+    elif dry_run:
+        print(colored.cyan(f"Mods folder not found at: {LOCAL_MODS_PATH}. Would create it and install every mod."))
+        result["status"] = "dry-run"
+        return result
     else:
         print(f"Mods folder not found at: {LOCAL_MODS_PATH}.")
-        user_input = input("Do you want to create the mods folder? (y/n): ").strip().lower()
+        user_input = core.ask("Do you want to create the mods folder? (y/n): ", "n")
         if user_input == 'y':
             try:
                 # Create the mods folder
@@ -42,125 +87,268 @@ def update_mods():
                 print(colored.cyan(f"Mods folder created at: {LOCAL_MODS_PATH}"))
             except Exception as e:
                 print(colored.red(f"Failed to create mods folder: {e}"))
+                result.update(status="failed", exit_code=core.EXIT_FAILED)
+                return result
         else:
             print(colored.red("Mods folder not created. The program will cancel its execution."))
-            core.safe_exit()
+            result.update(status="cancelled", exit_code=core.EXIT_CANCELLED)
+            return result
 
-    installed_mods = core.get_installed_mods(LOCAL_MODS_PATH)
+    if config.get("useModStore", True):
+        core.configure_mod_store(config.get("modStorePath") or core.get_default_mod_store_path(), config.get("modStoreMaxSizeMB", 4096))
+    core.configure_bandwidth(config.get("maxBandwidth", 0))  # KiB/s, 0 = unlimited
 
-    force_update_log = {}
+    cloud_environments = ["common", "client"]
+    if config.get("optionalMods", True):
+        cloud_environments.append("clientadditional")
+    core.set_http_cache_path(HTTP_CACHE_PATH, read_only=dry_run)
+    pack_state = core.load_pack_state(PACK_STATE_PATH)
 
-    cloud_common_mods = core.get_cloud_modlist("common")
-    cloud_mods = cloud_common_mods
+    with profiling.span("fetch cloud manifest", "phase"):
+        cloud_mods = core.fetch_cloud_manifest(cloud_environments)
+    if not cloud_mods:
+        print(colored.red("No mods found in the cloud modlists. Check the \"url\" value and your connection."))
+        result.update(status="failed", exit_code=core.EXIT_FAILED)
+        return result
 
-    cloud_client_mods = core.get_cloud_modlist("client")
-    cloud_mods.update(cloud_client_mods)
+    # Nothing changed in the cloud or in the mods folder since the last successful run
+    if not config.get("updateAll", False):
+        fingerprint = core.compute_pack_fingerprint(cloud_mods, core.cached_cloud_force_update_list, LOCAL_MODS_PATH, config)
+        if fingerprint == pack_state.get("fingerprint"):
+            print(colored.green("Modpack is unchanged since the last update. Everything is up-to-date!"))
+            result["status"] = "up-to-date"
+            return result
 
-    if config.get("optionalMods", True):
-        optional_mods = core.get_cloud_modlist("clientadditional")
-        cloud_mods.update(optional_mods)
+    # Modlists with a sha256 column need content hashes of the installed files
+    use_content_hash = config.get("indexContentHash", False) or any("sha256" in mod_data for mod_data in cloud_mods.values())
+    with profiling.span("scan installed mods", "phase"):
+        installed_mods = core.get_installed_mods(LOCAL_MODS_PATH, INSTALLED_INDEX_PATH, use_content_hash, core.get_scan_workers(config),
+                                                  save_index=not dry_run)
+
+    # Force update sequences applied this run; they are merged into the log, keeping the entries of untouched mods
+    force_update_log = {}
 
-    if not installed_mods:
+    fresh_install = not installed_mods
+    missing_mods = []
+    if fresh_install:
         print("No mods installed | Starting the downloading process")
-        print("Downloading mods.zip (common)")
-        core.download_and_extract_zips("mods.zip", "common", LOCAL_MODS_PATH)
-        print("Downloading mods.zip (client)")
-        core.download_and_extract_zips("mods.zip", "client", LOCAL_MODS_PATH)
-        if config.get("optionalMods", True) :
-            print("Downloading mods.zip (clientadditional)")
-            core.download_and_extract_zips("mods.zip", "clientadditional", LOCAL_MODS_PATH)
-        core.writeForceUpdateLog(FORCE_UPDATE_LOG_PATH, force_update_log)
-        print(colored.green("Mod downloading complete!"))
-        core.safe_exit()
-    
-    for mod_id, mod_data in cloud_mods.items():
-        cloud_filename = mod_data['filename']
-        cloud_version = mod_data['version']
-        environment = mod_data['environment']
-
-        if mod_id in installed_mods:
-            local_filenames = installed_mods[mod_id][0]  # List of installed filenames for this mod ID
-            local_versions = installed_mods[mod_id][1]  # List of installed versions of this mod ID
-            
-            if config.get("useVersionChecking", True) and not config.get("updateAll", False):
-                outdated_files = [
-                    local_filenames[i] for i, version in enumerate(local_versions) if version != cloud_version
-                ]
-                versionmatching_files = [
-                    local_filenames[i] for i, version in enumerate(local_versions) if version == cloud_version
-                ]
-                
-                kept_file_index = 0
-                duplicated_files = []
-                if len(versionmatching_files) > 1:
-                    # Prefer keeping the one with the cloud filename, otherwise keep the newest
-                    versionmatching_files.sort(key=lambda f: (f != cloud_filename, -os.path.getmtime(os.path.join(LOCAL_MODS_PATH, f))))
-                    kept_file_index = local_filenames.index(versionmatching_files[0])
-                    files_to_remove = versionmatching_files[1:]  # Keep only the first one
-                    duplicated_files.extend(files_to_remove)
-
-                for duplicated_file in duplicated_files:
-                    core.removeWithCheck(os.path.join(LOCAL_MODS_PATH, duplicated_file), f"Removed mod file duplicate: {duplicated_file}", f"File {duplicated_file} not found, skipping deletion.")
-
-                for outdated_file in outdated_files:
-                    core.removeWithCheck(os.path.join(LOCAL_MODS_PATH, outdated_file), f"Removed outdated mod file: {outdated_file}", f"File {outdated_file} not found, skipping deletion.")
-
-                local_version = local_versions[kept_file_index]
-                if local_version == cloud_version and not config.get("updateAll", False):
-                    newRandomSeqeunce = core.updateWhenForceUpdate(mod_id, FORCE_UPDATE_LOG_PATH)
-                    if newRandomSeqeunce == "":
-                        print(f"{mod_id} ({local_filenames[kept_file_index]}) is already up-to-date.")
-                        continue
-                    elif newRandomSeqeunce == core.get_recent_force_update(mod_id, FORCE_UPDATE_LOG_PATH):
-                        force_update_log[mod_id] = newRandomSeqeunce
-                        print(f"{mod_id} ({local_filenames[kept_file_index]}) is already up-to-date.")
-                        continue
-                    else:
-                        print(f"Updating {mod_id} caused by cloud force update")
-                        core.removeWithCheck(os.path.join(LOCAL_MODS_PATH, local_filenames[kept_file_index]), "", "")
-                        print(colored.cyan(f"Downloading updated version of {mod_id}: {cloud_filename}"))
-                        core.download_mod(cloud_filename, environment, LOCAL_MODS_PATH)
-                        force_update_log[mod_id] = newRandomSeqeunce
-                else:
-                    core.removeWithCheck(os.path.join(LOCAL_MODS_PATH, local_filenames[kept_file_index]), f"Removed outdated mod file: {local_filenames[kept_file_index]}", "")
-                    # Download the correct version (if not already present)
-                    print(colored.cyan(f"Downloading updated version of {mod_id}: {cloud_filename}"))
-                    core.download_mod(cloud_filename, environment, LOCAL_MODS_PATH)
-            else:    
-                # If not using version checking, check filename mismatch
-                outdated_files = [f for f in local_filenames if f != cloud_filename]
-                for outdated_file in outdated_files:
-                    core.removeWithCheck(os.path.join(LOCAL_MODS_PATH, outdated_file), f"Removed outdated mod file: {outdated_file}", f"File {outdated_file} not found, skipping deletion.")
-            
-                # If the correct file is already there, don't re-download
-                if cloud_filename in local_filenames and not config.get("updateAll", False):
-                    newRandomSeqeunce = core.updateWhenForceUpdate(mod_id, FORCE_UPDATE_LOG_PATH)
-                    if newRandomSeqeunce == "":
-                        print(f"{mod_id} ({local_filenames[kept_file_index]}) is already up-to-date.")
-                        continue
-                    elif newRandomSeqeunce == core.get_recent_force_update(mod_id, FORCE_UPDATE_LOG_PATH):
-                        force_update_log[mod_id] = newRandomSeqeunce
-                        print(f"{mod_id} ({local_filenames[kept_file_index]}) is already up-to-date.")
-                        continue
-                    else:
-                        print(f"Updating {mod_id} caused by cloud force update")
-                        core.removeWithCheck(os.path.join(LOCAL_MODS_PATH, local_filenames[kept_file_index]), "", "")
-                        print(colored.cyan(f"Downloading updated version of {mod_id}: {cloud_filename}"))
-                        core.download_mod(cloud_filename, environment, LOCAL_MODS_PATH)
-                        force_update_log[mod_id] = newRandomSeqeunce
-                
-                # Download the correct version (if not already present)
-                print(colored.cyan(f"Downloading updated version of {mod_id}: {cloud_filename}"))
-                core.download_mod(cloud_filename, environment, LOCAL_MODS_PATH)
+        if dry_run:
+            print(colored.cyan(f"Would install {len(cloud_mods)} mods from the mod store or mods.zip ({', '.join(cloud_environments)})"))
+            result.update(status="dry-run", plan={"download": len(cloud_mods), "remove": 0, "keep": 0})
+            return result
+        with profiling.span("install from mod store", "phase"):
+            installs = [core.with_force_sequence(mod_id, mod_data) for mod_id, mod_data in cloud_mods.items()]
+            missing_mods = core.install_mods_from_store(installs, LOCAL_MODS_PATH) if core.mod_store_path else installs
+        if missing_mods:
+            print(f"Downloading mods.zip ({', '.join(cloud_environments)})")
+            with profiling.span("download and extract zips", "phase"):
+                failed_parts = core.download_and_extract_all_zips("mods.zip", cloud_environments, LOCAL_MODS_PATH, config.get("downloadWorkers", core.DEFAULT_DOWNLOAD_WORKERS))
+            if failed_parts:
+                print(colored.yellow(f"{len(failed_parts)} zip parts failed, their mods are downloaded one by one"))
         else:
-            # If mod is not installed at all, download it
-            print(colored.cyan(f"New mod found: {mod_id} | Downloading {cloud_filename}."))
-            core.download_mod(cloud_filename, environment, LOCAL_MODS_PATH)
+            print(colored.cyan("Installed every mod from the local mod store"))
+        # Freshly extracted mods already include every cloud force update
+        force_update_log = dict(core.cached_cloud_force_update_list or {})
+        core.update_force_update_log(FORCE_UPDATE_LOG_PATH, force_update_log)
+
+        # A zip part can lag behind the modlists, so the installed mods are checked like on any other run
+        print("Checking the installed mods against the cloud modlists")
+        with profiling.span("scan installed mods", "phase"):
+            installed_mods = core.get_installed_mods(LOCAL_MODS_PATH, INSTALLED_INDEX_PATH, use_content_hash, core.get_scan_workers(config))
+
+    # Only the mods whose cloud entry changed since the last successful run are reconciled
+    changed_mod_ids = None
+    if not fresh_install and not config.get("updateAll", False):
+        changed_mod_ids = core.diff_pack_state(pack_state, cloud_mods, core.cached_cloud_force_update_list, LOCAL_MODS_PATH, config)
+    if changed_mod_ids is not None:
+        print(f"{len(changed_mod_ids)} mods changed in the cloud modlists since the last update")
+    reconciled_mods = cloud_mods if changed_mod_ids is None else {mod_id: cloud_mods[mod_id] for mod_id in sorted(changed_mod_ids) if mod_id in cloud_mods}
+    with profiling.span("reconcile", "phase") as event:
+        plan = planner.plan_updates(reconciled_mods, installed_mods, config, LOCAL_MODS_PATH, FORCE_UPDATE_LOG_PATH)
+        event["mods"] = len(reconciled_mods)
+    planner.print_plan(plan, dry_run)
+    result["plan"] = plan.summary()
+    if dry_run:
+        print(colored.green("Dry run complete. No files were changed."))
+        result["status"] = "dry-run"
+        return result
+
+    if fresh_install and missing_mods:
+        # Only extracted files the plan keeps match the modlists; stale ones must not be stored under the current key
+        extracted_filenames = {mod_data['filename'] for mod_data in missing_mods}
+        verified_mods = [core.with_force_sequence(action["mod_id"], cloud_mods[action["mod_id"]]) for action in plan.actions()
+                         if action["action"] == "keep" and action["filename"] in extracted_filenames
+                         and action["filename"] == cloud_mods[action["mod_id"]]['filename']]
+        core.add_installed_mods_to_store(verified_mods, LOCAL_MODS_PATH)
+
+    with profiling.span("apply plan", "phase"):
+        failed_downloads = planner.execute_plan(plan, LOCAL_MODS_PATH, config, force_update_log)
+
+    core.update_force_update_log(FORCE_UPDATE_LOG_PATH, force_update_log)
+    if not failed_downloads:
+        save_pack_state(cloud_mods, config)
+
+    print(colored.green("Mod downloading complete!" if fresh_install else "Mod update complete!"))
+    result.update(status="failed" if failed_downloads else ("installed" if fresh_install else "updated"), exit_code=core.EXIT_FAILED if failed_downloads else core.EXIT_OK,
+                  failed=[action["filename"] for action in failed_downloads])
+    return result
+
+def get_state_files():
+    """Return the names of the updater state files that belong to the mods folder and move with it."""
+    return [os.path.basename(path) for path in (FORCE_UPDATE_LOG_PATH, INSTALLED_INDEX_PATH, HTTP_CACHE_PATH, PACK_STATE_PATH)]
+
+def prepare_staged_update():
+    """Run the update against a staged copy of the mods folder, leaving the live folder untouched.
+
+    Returns the update_mods result; its status is "prepared" when a staged set is ready to commit.
+    """
+    live_mods_path = LOCAL_MODS_PATH
+    with profiling.span("stage mods folder", "phase"):
+        staged_mods_path = staged.create_stage(live_mods_path, get_state_files())
+    set_instance_paths(staged_mods_path)
+    try:
+        result = update_mods()
+    finally:
+        set_instance_paths(live_mods_path)
+    result["mods_path"] = live_mods_path
+    if result["status"] in ("installed", "updated"):
+        staged.mark_stage_ready(live_mods_path, result["status"])
+        result["status"] = "prepared"
+        print(colored.green("Update prepared. It is applied the next time the updater runs with --commit."))
+    else:
+        staged.discard_stage(live_mods_path)
+    return result
+
+def commit_staged_update():
+    """Swap a prepared staged set into place, keeping the replaced set for --rollback."""
+    result = {"status": "", "exit_code": core.EXIT_OK, "dry_run": False, "mods_path": LOCAL_MODS_PATH, "plan": None, "failed": []}
+    try:
+        with profiling.span("commit staged update", "phase"):
+            result["status"] = staged.commit_stage(LOCAL_MODS_PATH, get_state_files())
+    except OSError as e:
+        print(colored.red(f"Failed to swap in the staged mods folder: {e}. Close the game and try again."))
+        result.update(status="failed", exit_code=core.EXIT_FAILED, error=str(e))
+        return result
+    if result["status"] == "committed":
+        print(colored.green("Staged update applied. Run with --rollback to restore the previous mods."))
+    elif result["status"] == "stale":
+        print(colored.yellow("The mods folder changed after the update was prepared. Discarded the staged update."))
+    else:
+        print("No staged update to apply.")
+    return result
+
+def rollback_staged_update():
+    """Swap the mods replaced by the last commit back into place."""
+    result = {"status": "", "exit_code": core.EXIT_OK, "dry_run": False, "mods_path": LOCAL_MODS_PATH, "plan": None, "failed": []}
+    try:
+        result["status"] = staged.rollback(LOCAL_MODS_PATH, get_state_files())
+    except OSError as e:
+        print(colored.red(f"Failed to restore the previous mods folder: {e}. Close the game and try again."))
+        result.update(status="failed", exit_code=core.EXIT_FAILED, error=str(e))
+        return result
+    if result["status"] == "rolled-back":
+        print(colored.green("Restored the previous mods. Run --rollback again to return to the newer set."))
+    else:
+        print(colored.red("No previous mods folder to restore."))
+        result["exit_code"] = core.EXIT_FAILED
+    return result
+
+def launch_in_background(argv):
+    """Start the updater again as a detached process, without --background, logging to staged_update.log."""
+    command = [sys.executable] if getattr(sys, 'frozen', False) else [sys.executable, os.path.realpath(__file__)]
+    command += [arg for arg in argv if arg != "--background"] + ["--non-interactive"]
+    if os.name == "nt":
+        options = {"creationflags": subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        options = {"start_new_session": True}
+    log_path = os.path.join(os.path.dirname(LOCAL_MODS_PATH), "staged_update.log")
+    with open(log_path, "a") as log_file:
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=log_file, stderr=subprocess.STDOUT, **options)
+    print(f"Preparing the update in the background (PID {process.pid}), logging to {log_path}")
+    return {"status": "started", "exit_code": core.EXIT_OK, "dry_run": False, "mods_path": LOCAL_MODS_PATH, "plan": None, "failed": [], "pid": process.pid}
+
+def run_update(args, argv):
+    """Run the update mode selected on the command line and return its result dict."""
+    if args.background:
+        return launch_in_background(argv)
+    if not args.dry_run:
+        staged.recover_interrupted_swap(LOCAL_MODS_PATH, get_state_files())
+    if args.rollback:
+        return rollback_staged_update()
+    if args.commit:
+        return commit_staged_update()
+    if args.prepare or args.staged:
+        result = prepare_staged_update()
+        if args.staged and result["status"] == "prepared":
+            commit_result = commit_staged_update()
+            result.update(status=commit_result["status"], exit_code=commit_result["exit_code"])
+        return result
+    return update_mods(dry_run=args.dry_run)
+
+def main(argv=None):
+    """Command line entry point; returns the process exit code."""
+    global CONFIG_FILE_PATH
+    parser = argparse.ArgumentParser(description="Update the mods of the modpack while keeping client-side mods intact.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--dry-run", action="store_true", help="print the planned removals and downloads without changing any file")
+    mode.add_argument("--prepare", action="store_true", help="build the updated mods folder next to the live one without touching it")
+    mode.add_argument("--commit", action="store_true", help="swap a prepared update into place; the replaced mods are kept for --rollback")
+    mode.add_argument("--staged", action="store_true", help="prepare and commit in one run, so a failed update never leaves a half-updated folder")
+    mode.add_argument("--rollback", action="store_true", help="swap the mods replaced by the last commit back into place")
+    parser.add_argument("--background", action="store_true", help="with --prepare, run the preparation as a detached process and return at once")
+    parser.add_argument("--config", metavar="PATH", help=f"config file to use (default: {CONFIG_FILE_PATH})")
+    parser.add_argument("--mods", metavar="PATH", help="mods folder to update; the updater state files are kept in its parent folder "
+                                                        f"(default: {LOCAL_MODS_PATH})")
+    parser.add_argument("-y", "--yes", action="store_true", help="answer yes to every question and never wait for input")
+    parser.add_argument("--non-interactive", action="store_true", help="never wait for input; questions take their default answer")
+    parser.add_argument("--json", action="store_true", help="print a JSON result to stdout (other output goes to stderr); implies --non-interactive")
+    parser.add_argument("--profile", action="store_true", help="print a table of the time spent per phase, download and scanned JAR")
+    parser.add_argument("--profile-output", metavar="PATH", help="write the recorded timings to PATH")
+    parser.add_argument("--profile-format", choices=("json", "chrome"), default="json",
+                        help="format of --profile-output: a JSON report or a Chrome trace for chrome://tracing or Perfetto (default: json)")
+    if argv is None:
+        argv = sys.argv[1:]
+    args = parser.parse_args(argv)
+    if args.background and not args.prepare:
+        parser.error("--background requires --prepare")
+
+    core.non_interactive = args.yes or args.non_interactive or args.json
+    core.assume_yes = args.yes
+    if args.config:
+        CONFIG_FILE_PATH = os.path.abspath(args.config)
+    if args.mods:
+        set_instance_paths(args.mods)
 
-    core.writeForceUpdateLog(FORCE_UPDATE_LOG_PATH, force_update_log)
+    start_time = time.perf_counter()
+    profiling.reset()
+    with contextlib.redirect_stdout(sys.stderr) if args.json else contextlib.nullcontext():
+        try:
+            result = run_update(args, argv)
+        except SystemExit as e:
+            # load_config exits on configuration errors
+            if not args.json:
+                raise
+            exit_code = e.code if isinstance(e.code, int) else core.EXIT_FAILED
+            result = {"status": "config-error" if exit_code == core.EXIT_CONFIG_ERROR else "cancelled" if exit_code == core.EXIT_CANCELLED else "exited",
+                      "exit_code": exit_code, "dry_run": args.dry_run, "mods_path": LOCAL_MODS_PATH, "plan": None, "failed": []}
+        except Exception as e:
+            if not core.non_interactive:
+                raise
+            print(colored.red(f"Mod update failed: {e}"))
+            result = {"status": "failed", "exit_code": core.EXIT_FAILED, "dry_run": args.dry_run, "mods_path": LOCAL_MODS_PATH,
+                      "plan": None, "failed": [], "error": str(e)}
+        if args.profile:
+            profiling.print_summary()
+    result["elapsed_seconds"] = round(time.perf_counter() - start_time, 3)
+    if args.profile_output:
+        profiling.write_report(args.profile_output, args.profile_format)
+    if args.profile and args.json:
+        result["profile"] = profiling.summarize()
+    if args.json:
+        print(json.dumps(result))
+    return result["exit_code"]
 
-    print(colored.green("Mod update complete!"))
-    core.safe_exit()
 
 if __name__ == "__main__":
-    update_mods()
\ No newline at end of file
+    multiprocessing.freeze_support()  # Required for the scan process pool in PyInstaller builds
+    core.safe_exit(main())
@@ -1,11 +1,27 @@
 #!/usr/bin/env python3
 import os
+import re
 import sys
+import shutil
+import struct
+import tempfile
+import zlib
+import uuid
+import asyncio
+import threading
+import time
+import hashlib
+import io
+import concurrent.futures
 import zipfile
-import toml
 import requests
+import urllib3
 import json
 import colored_prints as colored
+import file_utils
+import profiling
+import jar_reader
+import mods_toml
 
 url_config = {}
 urls_initialized = False
@@ -13,6 +29,41 @@ urls_initialized = False
 cached_cloud_force_update_list = None
 cached_force_update_log = None
 
+http_session = None
+
+http_cache_path = None
+http_cache_read_only = False
+http_cache = None
+http_cache_lock = threading.Lock()
+# Bump when a parser used with fetch_cached_document changes, so cached parsed values are not reused
+HTTP_CACHE_FORMAT = 2
+
+mod_store_path = None
+mod_store_max_bytes = 0
+mod_store_index = None
+mod_store_lock = threading.Lock()
+
+bandwidth_limiter = None
+
+non_interactive = False  # Never wait for input(); prompts take their default answer
+assume_yes = False  # With non_interactive, answer "y" to every prompt instead
+
+MAX_HTTP_CONNECTIONS = 32
+DEFAULT_DOWNLOAD_WORKERS = 8
+IO_EXECUTOR_WORKERS = MAX_HTTP_CONNECTIONS * 2 + 4  # A socket read and a disk write per connection, plus manifest fetches
+HTTP_TIMEOUT = (10, 30)  # (connect, read) seconds
+DOWNLOAD_TIMEOUT = (10, 60)
+DEFAULT_DOWNLOAD_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 1
+RETRYABLE_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+MOD_STORE_INDEX = "store_index.json"
+SHA256_PATTERN = re.compile(r"[0-9a-fA-F]{64}")
+
+EXIT_OK = 0
+EXIT_FAILED = 1  # Some downloads failed or an unexpected error occurred
+EXIT_CONFIG_ERROR = 2
+EXIT_CANCELLED = 3  # A prompt was declined
+
 def load_config(config_file_path, default_config):
     """Load configuration from a JSON file, or use default values if not found."""
     if os.path.exists(config_file_path):
@@ -22,18 +73,18 @@ def load_config(config_file_path, default_config):
                 print("Config loaded successfully.")
                 if config.get("url") == "":
                     print(colored.red("Value \"url\" is empty. The program will cancel it's execution."))
-                    safe_exit()
+                    safe_exit(EXIT_CONFIG_ERROR)
                 initialize_urls((config["url"]))
                 return config
         except (json.JSONDecodeError, IOError) as e:
             print(colored.red(f"Error loading config file: {e}. Using default config."))
             if default_config.get("url") == "":
                 print(colored.red("Value \"url\" is empty. The program will cancel it's execution."))
-                safe_exit()
+                safe_exit(EXIT_CONFIG_ERROR)
     else:
         print("Config file not found.")
 
-        create_file_input = input("Do you want to create a new config file? (y/n): ").strip().lower()
+        create_file_input = ask("Do you want to create a new config file? (y/n): ", "y")
         if create_file_input == 'y':
             # Create the config file with default values
             try:
@@ -41,20 +92,23 @@ def load_config(config_file_path, default_config):
                     json.dump(default_config, config_file, indent=4)
                     print(colored.cyan(f"Config file created at: {config_file_path}"))
                     print(f"current config: {default_config}")
-                    exit_programm_input = input("Exit the program so you can modify the config file? (y/n): ")
+                    if non_interactive and default_config.get("url") == "":
+                        print(colored.red(f"Set \"url\" in {config_file_path} and run the updater again."))
+                        safe_exit(EXIT_CONFIG_ERROR)
+                    exit_programm_input = ask("Exit the program so you can modify the config file? (y/n): ", "n")
                     if exit_programm_input == 'y':
                         sys.exit(0) # Exit the program so the user can modify the config file
                     else:
                         print(f"Config file not modified. Continuing with default values: {default_config}")
                         if default_config.get("url") == "":
                             print(colored.red("Value \"url\" is empty. The program will cancel it's execution."))
-                            safe_exit()
+                            safe_exit(EXIT_CONFIG_ERROR)
             except Exception as e:
                 print(colored.red(f"Failed to create config file: {e}"))
-                safe_exit()
+                safe_exit(EXIT_CONFIG_ERROR)
         else:
             print(colored.red("Config file not created. The program will cancel it's execution."))
-            safe_exit()
+            safe_exit(EXIT_CANCELLED)
     
     #seems to be useless (next 2 lines)
     initialize_urls((config["url"]))
@@ -79,253 +133,487 @@ def initialize_urls(config_url):
     })
     urls_initialized = True
 
+def get_session():
+    """Return the shared requests.Session, so all requests reuse pooled keep-alive connections."""
+    global http_session
+    if http_session is None:
+        http_session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=MAX_HTTP_CONNECTIONS)
+        http_session.mount("http://", adapter)
+        http_session.mount("https://", adapter)
+    return http_session
+
+def run_async(coroutine):
+    """Run a coroutine of the async network layer to completion from synchronous code.
+
+    requests stays the HTTP client: its blocking calls, disk writes and hashing run on a thread
+    pool sized for MAX_HTTP_CONNECTIONS while the event loop schedules and overlaps them.
+    """
+    async def runner():
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=IO_EXECUTOR_WORKERS, thread_name_prefix="updater-io")
+        asyncio.get_running_loop().set_default_executor(executor)
+        return await coroutine
+    return asyncio.run(runner())
+
+MODS_TOML_PATH = "META-INF/mods.toml"
+MANIFEST_PATH = "META-INF/MANIFEST.MF"
+JARJAR_METADATA_PATH = "META-INF/jarjar/metadata.json"
+
+def _read_mods_toml_metadata(jar, names, label):
+    """Return (mod_id, version) of the first [[mods]] entry of an open jar, resolving ${file.jarVersion} via MANIFEST.MF."""
+    if MODS_TOML_PATH not in names:
+        return None, None
 
-def get_mod_id_from_toml(mod_path):
-    """Extract the primary mod ID from the mods.toml file inside a JAR."""
     try:
-        with zipfile.ZipFile(mod_path, 'r') as jar:
-            # Look for META-INF/mods.toml in the JAR
-            mods_toml_path = "META-INF/mods.toml"
-            if mods_toml_path in jar.namelist():
-                with jar.open(mods_toml_path) as toml_file:
-                    # Read the content of the mods.toml file as a string
-                    toml_content = toml_file.read().decode('utf-8')
-
-                    # Now load the TOML content
-                    mod_info = toml.loads(toml_content)
-
-                    # Extract only the first [[mods]] modId (ignore dependencies)
-                    mods_section = mod_info.get("mods", [])
-                    if mods_section and isinstance(mods_section, list):
-                        mod_id = mods_section[0].get("modId")
-                        if mod_id:
-                            return mod_id
-
-    except Exception as e:
-        print(colored.red(f"Failed to extract mod ID from {mod_path}: {e}"))
-
+        mod_id, mod_version = mods_toml.read_first_mod(jar, MODS_TOML_PATH)
+    except (ValueError, AttributeError, TypeError) as e:
+        # Invalid TOML or UTF-8, or an unexpected [[mods]] shape: the pinned and jarjar jars may still name the mod
+        print(colored.red(f"Failed to parse mods.toml in {label}: {e}"))
+        return None, None
+
+    if mod_version == "${file.jarVersion}":
+        print(f"Found '${{file.jarVersion}}' in mods.toml ({label}). Attempting to read from MANIFEST.MF...")
+        mod_version = None
+        if MANIFEST_PATH in names:
+            for line in jar.read(MANIFEST_PATH).decode("utf-8").splitlines():
+                if line.startswith("Implementation-Version:"):
+                    mod_version = line.split(":", 1)[1].strip()
+                    print(f"Resolved version from MANIFEST.MF ({label}): {mod_version}")
+                    break
+            else:
+                print(f"No 'Implementation-Version' found in MANIFEST.MF for {label}")
+        else:
+            print(f"MANIFEST.MF not found in {label}")
+
+    return mod_id, mod_version
+
+def _find_pinned_jar(jar, names, label):
+    """Return the nested jar referenced by pinnedFile= in a loader.properties entry, if any."""
+    for file_name in names:
+        if not file_name.lower().endswith('loader.properties'):
+            continue
+        properties_content = jar.read(file_name).decode('utf-8')
+        for line in properties_content.splitlines():
+            if line.startswith('pinnedFile='):
+                pinned_file = line.split('=')[1].strip()  # Remove any leading/trailing whitespace
+                print(f"Found pinnedFile: {pinned_file} in {label}")
+                # If pinnedFile starts with '/', remove the leading slash
+                if pinned_file.startswith('/'):
+                    pinned_file = pinned_file[1:]
+                if pinned_file in names:
+                    return pinned_file
+                print(colored.yellow(f"Pinned file {pinned_file} not found in {label}."))
     return None
 
-def get_mod_id_from_loader_properties(mod_path):
-    """Extract mod ID from loader.properties in the jar structure."""
-    try:
-        with zipfile.ZipFile(mod_path, 'r') as jar:
-            # Look for any file ending with loader.properties
-            for file_name in jar.namelist():
-                if file_name.lower().endswith('loader.properties'):
-                    with jar.open(file_name) as properties_file:
-                        # Read the properties file content
-                        properties_content = properties_file.read().decode('utf-8')
-
-                        # Search for pinnedFile (the actual mod file)
-                        for line in properties_content.splitlines():
-                            if line.startswith('pinnedFile='):
-                                pinned_file = line.split('=')[1].strip()  # Remove any leading/trailing whitespace
-                                print(f"Found pinnedFile: {pinned_file} in {mod_path}")
-
-                                # If pinnedFile starts with '/', remove the leading slash
-                                if pinned_file.startswith('/'):
-                                    pinned_file = pinned_file[1:]
-
-                                # Now we need to look inside the current jar file (mod_path) for pinned_file
-                                # Since it's a jar inside another jar, we open the nested jar
-                                with zipfile.ZipFile(mod_path, 'r') as parent_jar:
-                                    if pinned_file in parent_jar.namelist():
-                                        print(f"Looking for mod ID in pinned jar: {pinned_file}")
-                                        mod_id = get_mod_id_from_toml(parent_jar.open(pinned_file))
-                                        if mod_id:
-                                            print(f"Found mod ID ({mod_id}) in pinned jar: {pinned_file}")
-                                            return mod_id
-                                        else:
-                                            print(colored.yellow(f"Couldn't find mod ID in pinned jar: {pinned_file}"))
-                                            return "unknown"
-                                    else:
-                                        print(colored.yellow(f"Pinned file {pinned_file} not found in {mod_path}."))
-    except Exception as e:
-        print(colored.red(f"Failed to extract mod ID from {mod_path}: {e}"))
-
+def _find_kotlin_mod_jar(jar, names, label):
+    """Return the real mod jar listed as 'kffmod' in META-INF/jarjar/metadata.json, if any."""
+    if JARJAR_METADATA_PATH not in names:
+        return None
+    metadata = json.loads(jar.read(JARJAR_METADATA_PATH))
+    for jars in metadata.get('jars', []):
+        if jars['identifier']['artifact'] == 'kffmod':
+            mod_file_path = jars['path']
+            print(f"Found mod path: {mod_file_path} in metadata.json from {label}")
+            if mod_file_path in names:
+                return mod_file_path
+            print(f"Real mod file {mod_file_path} not found in {label}.")
+            return None
     return None
 
-def get_mod_id_kotlin_case(mod_path):
-    """Extract mod ID from loader.properties in the jar structure."""
+def _open_nested_jar(jar, nested_path):
+    """Open a jar stored inside an open JarReader or ZipFile, zero-copy when both levels are plain STORED zips."""
+    if isinstance(jar, jar_reader.JarReader):
+        try:
+            return jar.open_nested(nested_path)
+        except jar_reader.JarFormatError:
+            pass
+    return zipfile.ZipFile(io.BytesIO(jar.read(nested_path)), 'r')
+
+def _read_nested_jar_metadata(jar, nested_path, label):
+    """Return (mod_id, version) from the mods.toml of a jar stored inside an already open jar."""
+    with _open_nested_jar(jar, nested_path) as nested_jar:
+        nested_names = set(nested_jar.namelist())
+        return _read_mods_toml_metadata(nested_jar, nested_names, f"{nested_path} in {label}")
+
+def _read_mod_metadata(jar, mod_path):
+    """Return (mod_id, version) of an open JarReader or ZipFile, trying mods.toml, then the pinned jar, then the kffmod jar."""
+    names = jar.namelist()
+    name_set = set(names)
+    mod_id, mod_version = _read_mods_toml_metadata(jar, name_set, mod_path)
+
+    if not mod_id or not mod_version:
+        print(f"Mod metadata incomplete in {mod_path}, checking loader.properties...")
+        pinned_file = _find_pinned_jar(jar, names, mod_path)
+        if pinned_file:
+            print(f"Looking for mod metadata in pinned jar: {pinned_file}")
+            pinned_id, pinned_version = _read_nested_jar_metadata(jar, pinned_file, mod_path)
+            if not mod_id:
+                if pinned_id:
+                    print(f"Found mod ID ({pinned_id}) in pinned jar: {pinned_file}")
+                    mod_id = pinned_id
+                else:
+                    print(colored.yellow(f"Couldn't find mod ID in pinned jar: {pinned_file}"))
+                    mod_id = "unknown"
+            mod_version = mod_version or pinned_version
+
+    if not mod_id or not mod_version:
+        print(f"Mod metadata incomplete in {mod_path}, checking metadata.json...")
+        mod_file_path = _find_kotlin_mod_jar(jar, name_set, mod_path)
+        if mod_file_path:
+            print(f"Looking for mod metadata in real mod jar: {mod_file_path}")
+            kotlin_id, kotlin_version = _read_nested_jar_metadata(jar, mod_file_path, mod_path)
+            mod_id = mod_id or kotlin_id
+            mod_version = mod_version or kotlin_version
+
+    return mod_id, mod_version
+
+def read_jar_metadata(mod_path):
+    """Extract mod ID and version from a mod JAR, opening it and reading its central directory only once.
+
+    Falls back from META-INF/mods.toml to a loader.properties pinned jar and then to a
+    jarjar 'kffmod' entry. Returns a dict with 'mod_id' and 'version' (either may be None).
+    The JAR is memory-mapped with JarReader; archives it does not handle are read with zipfile.
+    """
+    metadata = {"mod_id": None, "version": None}
     try:
-        with zipfile.ZipFile(mod_path, 'r') as jar:
-            # Look for any file ending with loader.properties
-            metadata_path = "META-INF/jarjar/metadata.json"
-            if metadata_path in jar.namelist():
-                with jar.open(metadata_path) as json_file:
-                    # Now load the JSON content
-                    metadata = json.load(json_file)
-                    mod_file_path = None
-                    for jars in metadata['jars']:
-                        if jars['identifier']['artifact'] == 'kffmod':
-                            mod_file_path = jars['path']
-                            break
-
-                    if mod_file_path:
-                        print(f"Found mod path: {mod_file_path} in metadata.json from {mod_path}")
-                        with zipfile.ZipFile(mod_path, 'r') as parent_jar:
-                            if mod_file_path in parent_jar.namelist():
-                                print(f"Looking for mod ID in real mod jar: {mod_file_path}")
-                                mod_id = get_mod_id_from_toml(parent_jar.open(mod_file_path))
-                                if mod_id:
-                                    return mod_id
-                            else:
-                                print(f"Real mod file {mod_file_path} not found in {mod_path}.")
-
-            else:
-                print(f"metadata.json file not found in {mod_path}.")
+        try:
+            with jar_reader.JarReader(mod_path) as jar:
+                mod_id, mod_version = _read_mod_metadata(jar, mod_path)
+        except jar_reader.JarFormatError:
+            with zipfile.ZipFile(mod_path, 'r') as jar:
+                mod_id, mod_version = _read_mod_metadata(jar, mod_path)
+        metadata["mod_id"] = mod_id
+        metadata["version"] = mod_version
     except Exception as e:
-        print(colored.red(f"Failed to extract mod ID from {mod_path}: {e}"))
+        print(colored.red(f"Failed to extract mod metadata from {mod_path}: {e}"))
 
-    return None
+    return metadata
 
 
-def get_mod_version_from_toml(mod_path):
-    """Extract the primary mod version from the mods.toml file inside a JAR."""
-    try:
-        with zipfile.ZipFile(mod_path, 'r') as jar:
-            # Look for META-INF/mods.toml in the JAR
-            mods_toml_path = "META-INF/mods.toml"
-            if mods_toml_path in jar.namelist():
-                with jar.open(mods_toml_path) as toml_file:
-                    # Read the content of the mods.toml file as a string
-                    toml_content = toml_file.read().decode('utf-8')
-
-                    # Now load the TOML content
-                    mod_info = toml.loads(toml_content)
-
-                    # Extract only the first [[mods]] modId (ignore dependencies)
-                    mods_section = mod_info.get("mods", [])
-                    if mods_section and isinstance(mods_section, list):
-                        mod_version = mods_section[0].get("version")
-                        if mod_version == "${file.jarVersion}":
-                            print(f"Found '${{file.jarVersion}}' in mods.toml ({mod_path}). Attempting to read from MANIFEST.MF...")
-                            # Try to read MANIFEST.MF instead
-                            manifest_path = "META-INF/MANIFEST.MF"
-                            if manifest_path in jar.namelist():
-                                with jar.open(manifest_path) as manifest_file:
-                                    for line in manifest_file.read().decode("utf-8").splitlines():
-                                        if line.startswith("Implementation-Version:"):
-                                            real_version = line.split(":", 1)[1].strip()
-                                            print(f"Resolved version from MANIFEST.MF ({mod_path}): {real_version}")
-                                            return real_version
-                                    print(f"No 'Implementation-Version' found in MANIFEST.MF for {mod_path}")
-                            else:
-                                print(f"MANIFEST.MF not found in {mod_path}")
-                        elif mod_version:
-                            return mod_version
+INSTALLED_INDEX_FORMAT = 1
+MIN_PARALLEL_SCAN_FILES = 8
 
-    except Exception as e:
-        print(colored.red(f"Failed to extract mod version from {mod_path}: {e}"))
+PACK_FINGERPRINT_CONFIG_KEYS = ("updateAll", "optionalMods", "useVersionChecking")
 
-    return None
+def get_mods_folder_state(mods_path):
+    """Return a sorted list of (filename, size, mtime_ns) for the JARs in mods_path, using only stat calls."""
+    with os.scandir(mods_path) as entries:
+        return sorted(
+            (entry.name, entry.stat().st_size, entry.stat().st_mtime_ns)
+            for entry in entries if entry.name.endswith(".jar") and entry.is_file()
+        )
 
-def get_mod_version_from_loader_properties(mod_path):
-    """Extract mod version from loader.properties in the jar structure."""
-    try:
-        with zipfile.ZipFile(mod_path, 'r') as jar:
-            # Look for any file ending with loader.properties
-            for file_name in jar.namelist():
-                if file_name.lower().endswith('loader.properties'):
-                    with jar.open(file_name) as properties_file:
-                        # Read the properties file content
-                        properties_content = properties_file.read().decode('utf-8')
-
-                        # Search for pinnedFile (the actual mod file)
-                        for line in properties_content.splitlines():
-                            if line.startswith('pinnedFile='):
-                                pinned_file = line.split('=')[1].strip()  # Remove any leading/trailing whitespace
-                                print(f"Found pinnedFile: {pinned_file} in {mod_path}")
-
-                                # If pinnedFile starts with '/', remove the leading slash
-                                if pinned_file.startswith('/'):
-                                    pinned_file = pinned_file[1:]
-
-                                # Now we need to look inside the current jar file (mod_path) for pinned_file
-                                # Since it's a jar inside another jar, we open the nested jar
-                                with zipfile.ZipFile(mod_path, 'r') as parent_jar:
-                                    if pinned_file in parent_jar.namelist():
-                                        print(f"Looking for mod version in pinned jar: {pinned_file}")
-                                        mod_version = get_mod_version_from_toml(parent_jar.open(pinned_file))
-                                        if mod_version:
-                                            print(f"Found mod version ({mod_version}) in pinned jar: {pinned_file}")
-                                            return mod_version
-                                        else:
-                                            print(f"Couldn't find mod version in pinned jar: {pinned_file}")
-                                    else:
-                                        print(f"Pinned file {pinned_file} not found in {mod_path}.")
-    except Exception as e:
-        print(colored.red(f"Failed to extract mod version from {mod_path}: {e}"))
+def compute_pack_fingerprint(cloud_mods, force_update_list, mods_path, config):
+    """Hash the server URL, the merged cloud modlists, forceupdate.txt, the relevant config and the installed JAR state."""
+    pack_state = {
+        "url": url_config.get("base"),
+        "cloud_mods": cloud_mods,
+        "force_update": force_update_list or {},
+        "config": {key: config.get(key) for key in PACK_FINGERPRINT_CONFIG_KEYS},
+        "installed": get_mods_folder_state(mods_path),
+    }
+    return hashlib.sha256(json.dumps(pack_state, sort_keys=True).encode("utf-8")).hexdigest()
 
-    return None
+def load_pack_state(state_path):
+    """Return the pack state saved by the last successful run, or an empty dict."""
+    if os.path.exists(state_path):
+        try:
+            with open(state_path, "r") as state_file:
+                return json.load(state_file)
+        except (json.JSONDecodeError, IOError) as e:
+            print(colored.yellow(f"Error loading pack state: {e}. Running a full update."))
+    return {}
 
-def get_mod_version_kotlin_case(mod_path):
-    """Extract mod ID from loader.properties in the jar structure."""
+def save_pack_state(state_path, cloud_mods, force_update_list, mods_path, config):
+    """Atomically store the pack fingerprint and the reconciled cloud view of a successful run."""
+    pack_state = {
+        "fingerprint": compute_pack_fingerprint(cloud_mods, force_update_list, mods_path, config),
+        "url": url_config.get("base"),
+        "config": {key: config.get(key) for key in PACK_FINGERPRINT_CONFIG_KEYS},
+        "installed": get_mods_folder_state(mods_path),
+        "cloud_mods": cloud_mods,
+        "force_update": force_update_list or {},
+    }
     try:
-        with zipfile.ZipFile(mod_path, 'r') as jar:
-            # Look for any file ending with loader.properties
-            metadata_path = "META-INF/jarjar/metadata.json"
-            if metadata_path in jar.namelist():
-                with jar.open(metadata_path) as json_file:
-                    # Now load the JSON content
-                    metadata = json.load(json_file)
-                    mod_file_path = None
-                    for jars in metadata['jars']:
-                        if jars['identifier']['artifact'] == 'kffmod':
-                            mod_file_path = jars['path']
-                            break
-
-                    if mod_file_path:
-                        print(f"Found mod path: {mod_file_path} in metadata.json from {mod_path}")
-                        with zipfile.ZipFile(mod_path, 'r') as parent_jar:
-                            if mod_file_path in parent_jar.namelist():
-                                print(f"Looking for mod version in real mod jar: {mod_file_path}")
-                                mod_version = get_mod_version_from_toml(parent_jar.open(mod_file_path))
-                                if mod_version:
-                                    return mod_version
-                            else:
-                                print(f"Real mod file {mod_file_path} not found in {mod_path}.")
+        file_utils.write_json_atomically(state_path, pack_state)
+    except IOError as e:
+        print(colored.yellow(f"Failed to write pack state: {e}"))
+
+def diff_pack_state(pack_state, cloud_mods, force_update_list, mods_path, config):
+    """Return the IDs of mods whose modlist entry or force update changed since the cloud view saved in pack_state.
+
+    The freshly fetched modlists and forceupdate.txt are the source of truth; the saved view only tells
+    which of their entries need reconciling. Returns None when every mod has to be reconciled: no saved
+    view, another server URL, a config change or a mods folder that changed outside the updater.
+    """
+    if "cloud_mods" not in pack_state or pack_state.get("url") != url_config.get("base"):
+        return None
+    if pack_state.get("config") != {key: config.get(key) for key in PACK_FINGERPRINT_CONFIG_KEYS}:
+        return None
+    if pack_state.get("installed") != [list(state) for state in get_mods_folder_state(mods_path)]:
+        return None
+
+    saved_mods = pack_state["cloud_mods"]
+    saved_force_update_list = pack_state.get("force_update", {})
+    force_update_list = force_update_list or {}
+    changed_mod_ids = {mod_id for mod_id in saved_mods.keys() | cloud_mods.keys() if saved_mods.get(mod_id) != cloud_mods.get(mod_id)}
+    changed_mod_ids.update(mod_id for mod_id in saved_force_update_list.keys() | force_update_list.keys()
+                           if saved_force_update_list.get(mod_id) != force_update_list.get(mod_id))
+    return changed_mod_ids
+
+def compute_file_hash(file_path):
+    """Return the SHA-256 hex digest of a file, read in chunks."""
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def load_installed_index(index_path):
+    """Load the on-disk installed mod index, or return an empty one if missing or invalid."""
+    if index_path and os.path.exists(index_path):
+        try:
+            with open(index_path, "r") as index_file:
+                index = json.load(index_file)
+            if index.get("format") == INSTALLED_INDEX_FORMAT and isinstance(index.get("files"), dict):
+                return index
+            print(colored.yellow("Installed mod index has an unknown format. Rebuilding it."))
+        except (json.JSONDecodeError, IOError) as e:
+            print(colored.yellow(f"Error loading installed mod index: {e}. Rebuilding it."))
+    return {"format": INSTALLED_INDEX_FORMAT, "files": {}}
+
+def save_installed_index(index_path, index):
+    """Atomically write the installed mod index."""
+    file_utils.write_json_atomically(index_path, index)
+
+def _scan_jar(mod_path, cached, use_content_hash):
+    """Parse one JAR for the installed index; runs in a scan worker."""
+    file_hash = compute_file_hash(mod_path) if use_content_hash else None
+    if cached and file_hash and cached.get("sha256") == file_hash:
+        metadata = {"mod_id": cached.get("mod_id"), "version": cached.get("version")}
+    else:
+        metadata = read_jar_metadata(mod_path)
+    return metadata, file_hash
+
+def _timed_scan_jar(mod_path, cached, use_content_hash):
+    """Run _scan_jar and return (result, start, duration, pid) so pool workers can report their timing."""
+    start = time.perf_counter()
+    result = _scan_jar(mod_path, cached, use_content_hash)
+    return result, start, time.perf_counter() - start, os.getpid()
+
+def _record_scan(name, mod_path, timed_result):
+    result, start, duration, pid = timed_result
+    profiling.record(name, "scan", start, duration, pid=pid, bytes=os.path.getsize(mod_path))
+    return result
+
+def _init_scan_worker(stdout_to_stderr):
+    # Spawned workers start with the real stdout; keep their messages off it when the parent redirected it (--json)
+    if stdout_to_stderr:
+        sys.stdout = sys.stderr
+
+def _scan_jars(pending, use_content_hash, workers):
+    """Scan (name, path, cached) tuples, in a process pool when worthwhile. Returns {name: (metadata, file_hash)}."""
+    results = {}
+    workers = min(workers, len(pending))
+    if workers <= 1 or len(pending) < MIN_PARALLEL_SCAN_FILES:
+        for name, mod_path, cached in pending:
+            try:
+                results[name] = _record_scan(name, mod_path, _timed_scan_jar(mod_path, cached, use_content_hash))
+            except Exception as e:
+                print(colored.red(f"Failed to scan {mod_path}: {e}"))
+        return results
+
+    print(f"Scanning {len(pending)} mod files with {workers} workers...")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_scan_worker,
+                                                initargs=(sys.stdout is sys.stderr,)) as executor:
+        futures = {executor.submit(_timed_scan_jar, mod_path, cached, use_content_hash): (name, mod_path) for name, mod_path, cached in pending}
+        for future in concurrent.futures.as_completed(futures):
+            name, mod_path = futures[future]
+            try:
+                results[name] = _record_scan(name, mod_path, future.result())
+            except Exception as e:
+                # One corrupt JAR (or a crashed worker) must not stall the rest of the scan
+                print(colored.red(f"Failed to scan {mod_path}: {e}"))
+    return results
+
+def get_scan_workers(config):
+    """Return the number of scan workers from the 'scanWorkers' config key (0 or missing = one per CPU)."""
+    workers = config.get("scanWorkers", 0)
+    if not isinstance(workers, int) or workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+def get_installed_mods(mods_path, index_path=None, use_content_hash=False, workers=1, save_index=True):
+    """Retrieve a dictionary of installed mod IDs mapped to a list of their filenames.
+
+    When index_path is given, JAR metadata is cached there keyed by filename, size and
+    mtime, so only new or changed files are parsed and deleted files are evicted; without
+    save_index the index is only read (dry runs).
+    With use_content_hash, a changed file whose SHA-256 still matches its entry is not re-parsed.
+    Files that need parsing are spread across up to `workers` processes; the result is
+    ordered by filename regardless of completion order.
+    Each mod ID maps to [filenames, versions, sha256 hashes].
+    """
+    index = load_installed_index(index_path) if index_path else {"format": INSTALLED_INDEX_FORMAT, "files": {}}
+    cached_files = index["files"]
+    indexed_files = {}
+    index_changed = False
+
+    with os.scandir(mods_path) as entries:
+        jar_entries = sorted((entry for entry in entries if entry.name.endswith(".jar") and entry.is_file()), key=lambda entry: entry.name)
+
+    stats = {}
+    pending = []
+    for entry in jar_entries:
+        stat = entry.stat()
+        stats[entry.name] = stat
+        cached = cached_files.get(entry.name)
+        if cached and cached.get("size") == stat.st_size and cached.get("mtime_ns") == stat.st_mtime_ns:
+            if use_content_hash and not cached.get("sha256"):
+                # Backfill the content hash of an entry indexed without one
+                cached_files[entry.name] = dict(cached, sha256=compute_file_hash(entry.path))
+                index_changed = True
+            continue
+        pending.append((entry.name, entry.path, cached))
+
+    scanned = _scan_jars(pending, use_content_hash, workers) if pending else {}
+    pending_names = {name for name, _, _ in pending}
+
+    for entry in jar_entries:
+        name = entry.name
+        if name not in pending_names:
+            indexed_files[name] = cached_files[name]
+            continue
+        if name not in scanned:
+            continue  # Failed to scan, retried on the next run
+        metadata, file_hash = scanned[name]
+        stat = stats[name]
+        record = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "mod_id": metadata["mod_id"], "version": metadata["version"]}
+        if file_hash:
+            record["sha256"] = file_hash
+        indexed_files[name] = record
+        index_changed = True
+
+    if set(cached_files) != set(indexed_files):
+        index_changed = True  # Evict entries of deleted files
+    if index_path and save_index and index_changed:
+        index["files"] = indexed_files
+        try:
+            save_installed_index(index_path, index)
+        except IOError as e:
+            print(colored.yellow(f"Failed to write installed mod index: {e}"))
 
-            else:
-                print(f"metadata.json file not found in {mod_path}.")
-    except Exception as e:
-        print(colored.red(f"Failed to extract mod version from {mod_path}: {e}"))
+    installed_mods = {}
+    for filename, record in indexed_files.items():
+        mod_id = record["mod_id"]
+        if mod_id:
+            if mod_id not in installed_mods:
+                installed_mods[mod_id] = [[], [], []]  # Store lists of filenames, versions and content hashes
+            installed_mods[mod_id][0].append(filename)  # Add filename to the list
+            installed_mods[mod_id][1].append(record["version"])  # Add version to the list
+            installed_mods[mod_id][2].append(record.get("sha256"))  # Add content hash (None unless hashed) to the list
 
-    return None
+    return installed_mods
 
 
-def get_installed_mods(mods_path):
-    """Retrieve a dictionary of installed mod IDs mapped to a list of their filenames."""
-    installed_mods = {}
-    for filename in os.listdir(mods_path):
-        if filename.endswith(".jar"):
-            mod_path = os.path.join(mods_path, filename)
-            mod_id = get_mod_id_from_toml(mod_path)
-            mod_version = get_mod_version_from_toml(mod_path)
+def set_http_cache_path(cache_path, read_only=False):
+    """Enable the conditional-request cache for modlists and forceupdate.txt, stored at cache_path.
 
-            if not mod_id:
-                print(f"Mod ID not found in {filename}, checking loader.properties...")
-                mod_id = get_mod_id_from_loader_properties(mod_path)
-            if not mod_id:
-                print(f"Mod ID not found in {filename}, checking metadata.json...")
-                mod_id = get_mod_id_kotlin_case(mod_path)
-            
-            if not mod_version:
-                print(f"Mod version not found in {filename}, checking loader.properties...")
-                mod_version = get_mod_version_from_loader_properties(mod_path)
-            if not mod_version:
-                print(f"Mod version not found in {filename}, checking metadata.json...")
-                mod_version = get_mod_version_kotlin_case(mod_path)
-
-            if mod_id:
-                if mod_id not in installed_mods:
-                    installed_mods[mod_id] = [[], []]  # Store a list of filenames
-                installed_mods[mod_id][0].append(filename)  # Add filename to the list
-                installed_mods[mod_id][1].append(mod_version)  # Add filename to the list
+    With read_only, the cache is used for conditional requests but never written (dry runs).
+    """
+    global http_cache_path, http_cache, http_cache_read_only
+    http_cache_path = cache_path
+    http_cache_read_only = read_only
+    http_cache = None
 
-    return installed_mods
+def _load_http_cache():
+    """Return the cached entries by URL; a cache written with another HTTP_CACHE_FORMAT is ignored."""
+    global http_cache
+    if http_cache is None:
+        http_cache = {}
+        if http_cache_path and os.path.exists(http_cache_path):
+            try:
+                with open(http_cache_path, "r") as cache_file:
+                    cache = json.load(cache_file)
+                if isinstance(cache, dict) and cache.get("format") == HTTP_CACHE_FORMAT:
+                    http_cache = cache["entries"]
+            except (json.JSONDecodeError, IOError) as e:
+                print(colored.yellow(f"Error loading HTTP cache: {e}. Starting with an empty cache."))
+    return http_cache
+
+def _save_http_cache():
+    try:
+        file_utils.write_json_atomically(http_cache_path, {"format": HTTP_CACHE_FORMAT, "entries": http_cache})
+    except IOError as e:
+        print(colored.yellow(f"Failed to write HTTP cache: {e}"))
+
+def fetch_cached_document(url, parse, category="fetch"):
+    """GET a small text document and return parse(text), revalidating a cached copy with ETag/Last-Modified.
+
+    A 304 reuses the cached parsed value, and if the host is unreachable the last good copy is used.
+    Every 200 replaces the cached copy, also when the server sends no validators.
+    Returns None when the document is unavailable and nothing is cached. The request is profiled under category.
+    """
+    with profiling.span(url, category) as event:
+        with http_cache_lock:
+            entry = _load_http_cache().get(url) if http_cache_path else None
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
 
+        try:
+            response = get_session().get(url, headers=headers, timeout=HTTP_TIMEOUT)
+            event.update(status=response.status_code, bytes=len(response.content))
+        except requests.RequestException as e:
+            event["status"] = "unreachable"
+            if entry:
+                print(colored.yellow(f"Could not reach {url} ({e}). Using the last downloaded copy."))
+                return entry["parsed"]
+            print(colored.red(f"Could not reach {url}: {e}"))
+            return None
+
+        if response.status_code == 304 and entry:
+            print(f"{url} is unchanged since the last run")
+            return entry["parsed"]
+        if response.status_code != 200:
+            return None
+
+        parsed = parse(response.text)
+        if http_cache_path:
+            new_entry = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified"), "parsed": parsed}
+            with http_cache_lock:
+                if http_cache.get(url) != new_entry:
+                    http_cache[url] = new_entry
+                    if not http_cache_read_only:
+                        _save_http_cache()
+        return parsed
+
+def parse_modlist(text, environment):
+    """Parse modlist.txt lines of the form 'modid version [sha256] [size] filename'.
+
+    The optional sha256 column is a 64-digit hex digest and the optional size column the file
+    size in bytes; the filename is always last and may contain spaces.
+    """
+    modlist_dict = {}
+    for line in text.splitlines():
+        parts = line.split(maxsplit=2)
+        if len(parts) != 3:
+            continue
+        mod_id, mod_version, rest = parts
+        mod_data = {'version': f"{mod_version}", 'environment': f"{environment}"}
+        columns = rest.split(maxsplit=1)
+        if len(columns) == 2 and SHA256_PATTERN.fullmatch(columns[0]):
+            mod_data['sha256'] = columns[0].lower()
+            rest = columns[1]
+            columns = rest.split(maxsplit=1)
+        if len(columns) == 2 and columns[0].isdigit():
+            mod_data['size'] = int(columns[0])
+            rest = columns[1]
+        modlist_dict[mod_id] = {'filename': rest, **mod_data}
+    return modlist_dict
 
 def get_cloud_modlist(environment):
     """Fetch the modlist.txt from Netlify and return a dictionary with mod IDs, filenames, and a flag for the environment."""
@@ -337,173 +625,818 @@ def get_cloud_modlist(environment):
         mod_url = url_config["client_modlist"]
     elif environment == "clientadditional":
         mod_url = url_config["optional_modlist"]
-    
-    response = requests.get(mod_url)
-
-    if response.status_code == 200:
-        print(f"Fetching {environment} modlist.txt from {mod_url}")
-        modlist_lines = response.text.splitlines()
-        modlist_dict = {}
 
-        for line in modlist_lines:
-            parts = line.split(maxsplit=2)
-            if len(parts) == 3:
-                mod_id, mod_version, filename = parts
-                modlist_dict[mod_id] = {'filename': filename, 'version': f"{mod_version}", 'environment': f"{environment}"}
-
-        return modlist_dict
-    else:
+    print(f"Fetching {environment} modlist.txt from {mod_url}")
+    modlist_dict = fetch_cached_document(mod_url, lambda text: parse_modlist(text, environment), "modlist fetch")
+    if modlist_dict is None:
         print(colored.red(f"Failed to fetch {environment} modlist.txt from {mod_url}"))
         return {}
-    
+    return modlist_dict
 
-def download_and_extract_zips(base_zip_name, environment, local_mods_path):
-    """Download a mod zip file and extract its contents."""
+async def fetch_cloud_manifest_async(environments):
+    """Fetch the modlists of all environments and forceupdate.txt at once and return the merged cloud mod view.
+
+    Later environments override earlier ones for the same mod ID, as in the sequential merge.
+    The force update entries for these environments are stored in cached_cloud_force_update_list.
+    """
+    global cached_cloud_force_update_list
+    force_update_list, *modlists = await asyncio.gather(asyncio.to_thread(getForceUpdateCharSequences, environments),
+                                                        *(asyncio.to_thread(get_cloud_modlist, environment) for environment in environments))
+    cached_cloud_force_update_list = force_update_list
+
+    cloud_mods = {}
+    for modlist in modlists:
+        cloud_mods.update(modlist)
+    return cloud_mods
+
+def fetch_cloud_manifest(environments):
+    """Synchronous wrapper of fetch_cloud_manifest_async."""
+    return run_async(fetch_cloud_manifest_async(environments))
+
+PART_SUFFIX = ".part"
+PART_VALIDATOR_SUFFIX = ".part.validator"  # ETag or Last-Modified of the response a .part file was started from
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+ZIP_SPOOL_MAX_MEMORY = 64 * 1024 * 1024
+ZIP_PARTS_MANIFEST = "parts.txt"
+ZIP_PROBE_BATCH = 4
+
+MIN_THROTTLED_CHUNK_SIZE = 16 * 1024
+
+class BandwidthLimiter:
+    """Token bucket shared by every download and zip extraction, limiting their combined rate.
+
+    Reading more than the available tokens puts the bucket in debt, and the reader waits until it is
+    paid back, so the average rate holds even for chunks larger than one second of bandwidth.
+    """
+
+    def __init__(self, bytes_per_second):
+        self.rate = bytes_per_second
+        self.tokens = float(bytes_per_second)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, size):
+        """Take size bytes from the bucket and return how many seconds the caller must wait."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= size
+            return -self.tokens / self.rate if self.tokens < 0 else 0
+
+    def chunk_size(self):
+        """Return a read size of about 1/10 s of bandwidth, so throttled transfers stay smooth."""
+        return max(MIN_THROTTLED_CHUNK_SIZE, min(DOWNLOAD_CHUNK_SIZE, self.rate // 10))
+
+class ThrottledReader:
+    """File-like wrapper that paces read() calls with the bandwidth limiter."""
+
+    def __init__(self, stream, limiter):
+        self.stream = stream
+        self.limiter = limiter
+
+    def read(self, size):
+        data = self.stream.read(min(size, self.limiter.chunk_size()))
+        delay = self.limiter.reserve(len(data))
+        if delay:
+            time.sleep(delay)
+        return data
+
+def configure_bandwidth(max_kib_per_second):
+    """Limit the combined download rate to max_kib_per_second KiB/s ('maxBandwidth' config key); 0 disables the limit."""
+    global bandwidth_limiter
+    if isinstance(max_kib_per_second, (int, float)) and max_kib_per_second > 0:
+        bandwidth_limiter = BandwidthLimiter(int(max_kib_per_second * 1024))
+        print(f"Limiting downloads to {max_kib_per_second:g} KiB/s")
+    else:
+        bandwidth_limiter = None
+
+def get_download_chunk_size():
+    return bandwidth_limiter.chunk_size() if bandwidth_limiter else DOWNLOAD_CHUNK_SIZE
+
+class HashMismatchError(Exception):
+    """Raised when downloaded bytes do not match the SHA-256 published in the modlist."""
+
+async def stream_to_file_async(response, target_path, expected_sha256=None):
+    """Stream a response body in chunks into target_path.part, then atomically rename it into place.
+
+    Memory use stays constant regardless of file size, and an interrupted transfer never
+    leaves a truncated file under the final name. A 206 response is appended to the existing
+    .part file, and a transfer cut off by a network error keeps its .part file so it can be
+    resumed. With expected_sha256, the bytes are hashed as they arrive and a mismatching file
+    is discarded. Each chunk is written and hashed in the executor while the next one is read
+    from the socket, at the pace allowed by the bandwidth limiter. Returns the number of bytes received.
+    """
+    temp_path = f"{target_path}{PART_SUFFIX}"
+    received = 0
+    resuming = response.status_code == 206 and os.path.exists(temp_path)
+    sha256 = hashlib.sha256() if expected_sha256 else None
+    chunks = response.iter_content(chunk_size=get_download_chunk_size())
+    try:
+        if resuming and sha256:
+            await asyncio.to_thread(_hash_file_into, temp_path, sha256)
+        with open(temp_path, 'ab' if resuming else 'wb') as temp_file:
+            def write_chunk(chunk):
+                temp_file.write(chunk)
+                if sha256:
+                    sha256.update(chunk)
+
+            pending_write = None
+            try:
+                while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+                    if pending_write:
+                        await pending_write
+                    received += len(chunk)
+                    pending_write = asyncio.ensure_future(asyncio.to_thread(write_chunk, chunk))
+                    if bandwidth_limiter and (delay := bandwidth_limiter.reserve(len(chunk))):
+                        await asyncio.sleep(delay)
+            finally:
+                if pending_write:
+                    await pending_write
+        if sha256 and sha256.hexdigest() != expected_sha256:
+            raise HashMismatchError(f"SHA-256 mismatch for {os.path.basename(target_path)}: expected {expected_sha256}, got {sha256.hexdigest()}")
+        os.replace(temp_path, target_path)
+        return received
+    except requests.RequestException:
+        raise  # Keep the partial file for a Range request on the next attempt
+    except BaseException:
+        removeWithCheck(temp_path, "", "")
+        raise
+
+def stream_to_file(response, target_path, expected_sha256=None):
+    """Synchronous wrapper of stream_to_file_async."""
+    return run_async(stream_to_file_async(response, target_path, expected_sha256))
+
+def _hash_file_into(file_path, sha256):
+    with open(file_path, 'rb') as hashed_file:
+        for chunk in iter(lambda: hashed_file.read(DOWNLOAD_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+
+def unique_part_path(target_path):
+    """Return a .part path for target_path that concurrent extractions cannot collide on."""
+    return f"{target_path}.{uuid.uuid4().hex[:8]}{PART_SUFFIX}"
+
+def safe_member_path(destination, member_name):
+    """Map a zip member name onto destination, dropping absolute prefixes and '..' components like zipfile does."""
+    parts = [part for part in member_name.replace("\\", "/").split("/") if part not in ("", ".", "..")]
+    if parts and len(parts[0]) == 2 and parts[0][1] == ":":
+        parts = parts[1:]  # Drop Windows drive letters
+    return os.path.join(destination, *parts) if parts else None
+
+def file_matches(file_path, size, crc):
+    """Return True if file_path exists with the given size and CRC-32."""
+    try:
+        if os.path.getsize(file_path) != size:
+            return False
+        file_crc = 0
+        with open(file_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(DOWNLOAD_CHUNK_SIZE), b""):
+                file_crc = zlib.crc32(chunk, file_crc)
+        return file_crc == crc
+    except OSError:
+        return False
+
+def extract_zip_atomically(zip_ref, destination, members=None):
+    """Extract every member of an open zip (or the given ZipInfo members), writing each file via a .part file and an atomic rename.
+
+    Members whose target already exists with the same size and CRC-32 are skipped.
+    """
+    for member in zip_ref.infolist() if members is None else members:
+        target_path = safe_member_path(destination, member.filename)
+        if target_path is None:
+            continue
+        if member.is_dir():
+            os.makedirs(target_path, exist_ok=True)
+            continue
+        if file_matches(target_path, member.file_size, member.CRC):
+            continue
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        temp_path = unique_part_path(target_path)
+        try:
+            with zip_ref.open(member) as source, open(temp_path, 'wb') as target:
+                shutil.copyfileobj(source, target, DOWNLOAD_CHUNK_SIZE)
+            os.replace(temp_path, target_path)
+        except BaseException:
+            removeWithCheck(temp_path, "", "")
+            raise
+
+class StreamingUnsupportedError(Exception):
+    """Raised when a zip member cannot be extracted from its local header alone.
+
+    offset is where the member's local header starts in the archive, and header holds the bytes
+    of it that were already read from the stream.
+    """
+
+    def __init__(self, member_name, offset, header):
+        super().__init__(member_name)
+        self.offset = offset
+        self.header = header
+
+ZIP_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+ZIP_LOCAL_HEADER_SIGNATURE = 0x04034b50
+ZIP_END_SIGNATURES = (0x02014b50, 0x06054b50)  # Central directory / end of central directory
+
+def _read_exact(stream, size):
+    """Read exactly size bytes from a file-like stream, failing on a premature end."""
+    data = bytearray()
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise EOFError("Unexpected end of zip stream")
+        data += chunk
+    return bytes(data)
+
+def _copy_stream_member(stream, compressed_size, method, target):
+    """Copy one member's compressed bytes from the stream, inflating into target (or discarding if None). Returns (size, crc)."""
+    decompressor = zlib.decompressobj(-zlib.MAX_WBITS) if method == zipfile.ZIP_DEFLATED else None
+    remaining = compressed_size
+    size = 0
+    crc = 0
+    while remaining:
+        chunk = _read_exact(stream, min(remaining, DOWNLOAD_CHUNK_SIZE))
+        remaining -= len(chunk)
+        if target is None:
+            continue
+        data = decompressor.decompress(chunk) if decompressor else chunk
+        target.write(data)
+        size += len(data)
+        crc = zlib.crc32(data, crc)
+    if decompressor and target is not None:
+        data = decompressor.flush()
+        target.write(data)
+        size += len(data)
+        crc = zlib.crc32(data, crc)
+    return size, crc
+
+def _stream_extract_members(stream, destination):
+    """Extract zip members in the order they arrive by walking their local file headers."""
+    next_offset = 0
+    while True:
+        offset = next_offset
+        signature = struct.unpack("<I", _read_exact(stream, 4))[0]
+        if signature in ZIP_END_SIGNATURES:
+            return
+        if signature != ZIP_LOCAL_HEADER_SIGNATURE:
+            raise zipfile.BadZipFile(f"Unexpected zip record signature {signature:#010x}")
+        header = struct.pack("<I", signature) + _read_exact(stream, ZIP_LOCAL_HEADER.size - 4)
+        (_, _, flags, method, _, _, crc, compressed_size, file_size, name_length, extra_length) = ZIP_LOCAL_HEADER.unpack(header)
+        raw_name = _read_exact(stream, name_length)
+        extra = _read_exact(stream, extra_length)
+        member_name = raw_name.decode('utf-8' if flags & 0x800 else 'cp437')
+
+        # Sizes live in a trailing data descriptor (bit 3), the member is encrypted (bit 0),
+        # uses ZIP64 or an unsupported compression method: only the central directory can help.
+        if flags & 0x09 or method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED) or 0xFFFFFFFF in (compressed_size, file_size):
+            raise StreamingUnsupportedError(member_name, offset, header + raw_name + extra)
+        next_offset = offset + len(header) + name_length + extra_length + compressed_size
+
+        target_path = safe_member_path(destination, member_name)
+        if target_path is None or member_name.endswith("/"):
+            if target_path is not None:
+                os.makedirs(target_path, exist_ok=True)
+            _copy_stream_member(stream, compressed_size, method, None)
+            continue
+        if file_matches(target_path, file_size, crc):
+            _copy_stream_member(stream, compressed_size, method, None)
+            continue
+
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        temp_path = unique_part_path(target_path)
+        try:
+            with open(temp_path, 'wb') as target:
+                written_size, written_crc = _copy_stream_member(stream, compressed_size, method, target)
+            if (written_size, written_crc) != (file_size, crc):
+                raise zipfile.BadZipFile(f"CRC or size mismatch for {member_name}")
+            os.replace(temp_path, target_path)
+        except BaseException:
+            removeWithCheck(temp_path, "", "")
+            raise
+
+def _extract_rest_from_spool(stream, unsupported, destination):
+    """Spool the rest of a zip download after the member stream extraction stopped at, and extract it via the central directory.
+
+    Zeros stand in for the part of the archive that was already extracted, so the central directory
+    offsets stay valid without downloading that part again; only members from there on are extracted.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_MAX_MEMORY) as spool:
+        if unsupported.offset > ZIP_SPOOL_MAX_MEMORY:
+            spool.rollover()  # Skip the extracted part in a (sparse) file rather than as zeros in memory
+        spool.seek(unsupported.offset)
+        spool.write(unsupported.header)
+        for chunk in iter(lambda: stream.read(DOWNLOAD_CHUNK_SIZE), b""):
+            spool.write(chunk)
+        spool.seek(0)
+        with zipfile.ZipFile(spool, 'r') as zip_ref:
+            members = [member for member in zip_ref.infolist() if member.header_offset >= unsupported.offset]
+            extract_zip_atomically(zip_ref, destination, members)
+
+def stream_extract_zip(response, zip_url, destination):
+    """Extract a zip while it downloads, without storing the archive itself.
+
+    From the first member that cannot be read from its local header alone (e.g. one with a data
+    descriptor, as written by Java's jar tool), the rest of the same download is spooled into a
+    temporary file (in memory up to ZIP_SPOOL_MAX_MEMORY) and extracted from there.
+    Returns the number of bytes downloaded.
+    """
+    response.raw.decode_content = True
+    stream = ThrottledReader(response.raw, bandwidth_limiter) if bandwidth_limiter else response.raw
+    try:
+        _stream_extract_members(stream, destination)
+    except StreamingUnsupportedError as e:
+        print(colored.yellow(f"Cannot stream-extract {e} from {zip_url}, extracting the rest from a spooled copy of the archive."))
+        _extract_rest_from_spool(stream, e, destination)
+    return response.raw.tell()
+
+def get_environment_base_url(environment):
+    """Return the base URL of an environment's mod folder, or None for an unknown environment."""
     if not urls_initialized:
         raise RuntimeError("URL configuration not initialized. Ensure load_config() is called first.")
     if environment == "server":
-        base_url = url_config["server_mods"]
+        return url_config["server_mods"]
     elif environment == "common":
-        base_url = url_config["common_mods"]
+        return url_config["common_mods"]
     elif environment == "client":
-        base_url = url_config["client_mods"]
+        return url_config["client_mods"]
     elif environment == "clientadditional":
-        base_url = url_config["optional_mods"]
-    else:
-        print(colored.red(f"Unknown environment for downloading mods.zip: {environment}"))
-        return
+        return url_config["optional_mods"]
+    return None
 
-    index = 0
-    while True:
-        zip_filename = (
-            f"{base_zip_name}" if index == 0
-            else f"{os.path.splitext(base_zip_name)[0]}{index}.zip"
-        )
-        zip_url = f"{base_url}/{zip_filename}"
-        print(f"Trying to download: {zip_url}")
+def zip_part_name(base_zip_name, index):
+    """Return the file name of zip part index: mods.zip, mods1.zip, mods2.zip, ..."""
+    return base_zip_name if index == 0 else f"{os.path.splitext(base_zip_name)[0]}{index}.zip"
 
-        response = requests.get(zip_url, stream=True)
-    
-        if response.status_code != 200:
-            if index == 0:
-                print(f"No zip file found at {zip_url}")
-                index += 1
-                continue
-            elif index > 0:
-                print(f"No zip file found at {zip_url}")
-                break
+def _url_exists(url):
+    """Check whether url exists with a HEAD request, falling back to a streamed GET if HEAD is not allowed."""
+    try:
+        response = get_session().head(url, allow_redirects=True, timeout=HTTP_TIMEOUT)
+        if response.status_code in (405, 501):
+            with get_session().get(url, stream=True, timeout=HTTP_TIMEOUT) as response:
+                return response.status_code == 200
+        return response.status_code == 200
+    except requests.RequestException as e:
+        print(colored.red(f"Failed to probe {url}: {e}"))
+        return False
+
+def discover_zip_parts(base_zip_name, environment):
+    """Return the URLs of an environment's mods.zip, mods1.zip, ... parts.
+
+    Uses the optional parts.txt manifest (one part filename per line) when present, otherwise
+    probes ZIP_PROBE_BATCH part indexes at a time with concurrent HEAD requests. As before,
+    a missing mods.zip does not stop mods1.zip and later parts from being found.
+    """
+    base_url = get_environment_base_url(environment)
+    if base_url is None:
+        print(colored.red(f"Unknown environment for downloading mods.zip: {environment}"))
+        return []
 
-        zip_path = os.path.join(local_mods_path, zip_filename)
-        with open(zip_path, 'wb') as zip_file:
-            zip_file.write(response.content)
+    try:
+        with get_session().get(f"{base_url}/{ZIP_PARTS_MANIFEST}", timeout=HTTP_TIMEOUT) as response:
+            if response.status_code == 200:
+                part_names = [line.strip() for line in response.text.splitlines() if line.strip()]
+                print(f"Found {len(part_names)} zip parts in {ZIP_PARTS_MANIFEST} ({environment})")
+                return [f"{base_url}/{part_name}" for part_name in part_names]
+    except requests.RequestException as e:
+        print(colored.yellow(f"Failed to fetch {ZIP_PARTS_MANIFEST} ({environment}): {e}"))
+
+    part_urls = []
+    start = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=ZIP_PROBE_BATCH) as executor:
+        while True:
+            urls = [f"{base_url}/{zip_part_name(base_zip_name, index)}" for index in range(start, start + ZIP_PROBE_BATCH)]
+            for index, (url, exists) in enumerate(zip(urls, executor.map(_url_exists, urls)), start):
+                if exists:
+                    part_urls.append(url)
+                elif index > 0:
+                    print(f"Found {len(part_urls)} zip parts for {environment}")
+                    return part_urls
+                else:
+                    print(f"No zip file found at {url}")
+            start += ZIP_PROBE_BATCH
+
+def _extract_zip_url(zip_url, local_mods_path):
+    """Download and stream-extract a single zip part. Returns True on success."""
+    try:
+        with profiling.span(zip_url, "extract") as event, get_session().get(zip_url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+            event["status"] = response.status_code
+            if response.status_code != 200:
+                print(colored.red(f"Failed to download {zip_url}"))
+                return False
+            event["bytes"] = stream_extract_zip(response, zip_url, local_mods_path)
+    except (requests.RequestException, urllib3.exceptions.HTTPError, zipfile.BadZipFile, EOFError, OSError) as e:
+        # Raw stream reads raise urllib3 errors such as ReadTimeoutError directly
+        print(colored.red(f"Failed to extract {zip_url}: {e}"))
+        return False
+    print(colored.cyan(f"Extracted mods from {zip_url} into {local_mods_path}"))
+    return True
+
+async def download_and_extract_all_zips_async(base_zip_name, environments, local_mods_path, workers=DEFAULT_DOWNLOAD_WORKERS):
+    """Discover the zip parts of every environment and download and extract each part as soon as it is found.
+
+    The parts of one environment extract while the others are still being discovered, with at most
+    `workers` parts downloading at once. Returns the list of part URLs that failed.
+    """
+    semaphore = asyncio.Semaphore(max(1, min(workers, MAX_HTTP_CONNECTIONS)))
+
+    async def extract(zip_url):
+        async with semaphore:
+            return await asyncio.to_thread(_extract_zip_url, zip_url, local_mods_path)
+
+    async def discover_and_extract(environment):
+        part_urls = await asyncio.to_thread(discover_zip_parts, base_zip_name, environment)
+        if part_urls:
+            print(f"Downloading {len(part_urls)} zip parts ({environment})...")
+        results = await asyncio.gather(*(extract(url) for url in part_urls))
+        return [url for url, succeeded in zip(part_urls, results) if not succeeded]
+
+    failed_lists = await asyncio.gather(*(discover_and_extract(environment) for environment in environments))
+    return [url for failed_urls in failed_lists for url in failed_urls]
+
+def download_and_extract_all_zips(base_zip_name, environments, local_mods_path, workers=DEFAULT_DOWNLOAD_WORKERS):
+    """Synchronous wrapper of download_and_extract_all_zips_async."""
+    return run_async(download_and_extract_all_zips_async(base_zip_name, environments, local_mods_path, workers))
 
-        # Now extract the contents of the zip file
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(local_mods_path)
-        print(colored.cyan(f"Extracted mods from {zip_filename} ({environment}) into {local_mods_path}"))
+def download_and_extract_zips(base_zip_name, environment, local_mods_path):
+    """Download a mod zip file and extract its contents."""
+    return download_and_extract_all_zips(base_zip_name, [environment], local_mods_path)
+
+def get_default_mod_store_path():
+    """Return the per-user mod store location shared by every instance on this machine."""
+    if os.name == 'nt':
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        return os.path.join(base, "ModUpdater", "modstore")
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "modupdater", "modstore")
+
+def configure_mod_store(store_path, max_size_mb):
+    """Enable the content-addressed mod store at store_path (None disables it), capped at max_size_mb."""
+    global mod_store_path, mod_store_max_bytes, mod_store_index
+    mod_store_path = store_path
+    mod_store_max_bytes = max(0, int(max_size_mb)) * 1024 * 1024
+    mod_store_index = None
+
+def get_mod_store_key(mod_data):
+    """Return the store key of a modlist entry: its SHA-256 if published, else environment/version[/force sequence]/filename.
+
+    A forced update rebuilds a JAR under the same version and filename, so without a hash the
+    cloud force sequence (see with_force_sequence) is part of the key and old bytes are never reused.
+    """
+    if not mod_store_path:
+        return None
+    if mod_data.get('sha256'):
+        return f"sha256/{mod_data['sha256'][:2]}/{mod_data['sha256']}.jar"
+    version = re.sub(r'[^0-9A-Za-z._+-]', '_', mod_data['version'])
+    if mod_data.get('force_sequence'):
+        version = f"{version}/force-{re.sub(r'[^0-9A-Za-z._+-]', '_', mod_data['force_sequence'])}"
+    return f"named/{mod_data['environment']}/{version}/{mod_data['filename']}"
+
+def with_force_sequence(mod_id, mod_data):
+    """Return a modlist entry to install, carrying the mod's cloud force update sequence for its store key."""
+    sequence = get_cloud_force_update(mod_id)
+    return dict(mod_data, force_sequence=sequence) if sequence else mod_data
+
+def _load_mod_store_index():
+    global mod_store_index
+    if mod_store_index is None:
+        mod_store_index = {}
+        index_path = os.path.join(mod_store_path, MOD_STORE_INDEX)
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, "r") as index_file:
+                    mod_store_index = json.load(index_file)
+            except (json.JSONDecodeError, IOError) as e:
+                print(colored.yellow(f"Error loading mod store index: {e}. Starting with an empty index."))
+    return mod_store_index
+
+def install_from_mod_store(store_key, target_path):
+    """Install a stored file at target_path. Returns False if the store does not have it."""
+    store_file = os.path.join(mod_store_path, *store_key.split("/"))
+    with mod_store_lock:
+        entry = _load_mod_store_index().get(store_key)
+    if not entry or not os.path.exists(store_file):
+        return False
+    try:
+        file_utils.link_or_copy(store_file, target_path)
+    except OSError as e:
+        print(colored.yellow(f"Failed to install {os.path.basename(target_path)} from the mod store: {e}"))
+        return False
+    with mod_store_lock:
+        entry["last_used"] = time.time()
+    return True
+
+def add_to_mod_store(store_key, file_path):
+    """Record a freshly installed file in the mod store (as a hardlink when possible).
+
+    A named entry is replaced, since a fresh download is the server's current copy; a sha256
+    entry is content-addressed and only written once.
+    """
+    store_file = os.path.join(mod_store_path, *store_key.split("/"))
+    try:
+        os.makedirs(os.path.dirname(store_file), exist_ok=True)
+        if store_key.startswith("named/") or not os.path.exists(store_file):
+            file_utils.link_or_copy(file_path, store_file)
+    except OSError as e:
+        print(colored.yellow(f"Failed to add {os.path.basename(file_path)} to the mod store: {e}"))
+        return
+    with mod_store_lock:
+        _load_mod_store_index()[store_key] = {"size": os.path.getsize(store_file), "last_used": time.time()}
 
-        os.remove(zip_path)  # Remove the zip file after extraction
-        index += 1
+def save_mod_store_index():
+    """Evict least recently used files above the size cap and write the mod store index."""
+    if not mod_store_path or mod_store_index is None:
+        return
+    with mod_store_lock:
+        # Merge entries other instances added since this index was loaded
+        index_path = os.path.join(mod_store_path, MOD_STORE_INDEX)
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, "r") as index_file:
+                    for store_key, entry in json.load(index_file).items():
+                        mod_store_index.setdefault(store_key, entry)
+            except (json.JSONDecodeError, IOError):
+                pass
+        total_size = sum(entry["size"] for entry in mod_store_index.values())
+        if mod_store_max_bytes:
+            for store_key, entry in sorted(mod_store_index.items(), key=lambda item: item[1]["last_used"]):
+                if total_size <= mod_store_max_bytes:
+                    break
+                removeWithCheck(os.path.join(mod_store_path, *store_key.split("/")), f"Evicted {store_key} from the mod store", "")
+                del mod_store_index[store_key]
+                total_size -= entry["size"]
+        try:
+            os.makedirs(mod_store_path, exist_ok=True)
+            file_utils.write_json_atomically(index_path, mod_store_index)
+        except IOError as e:
+            print(colored.yellow(f"Failed to write mod store index: {e}"))
+
+def install_mods_from_store(mods, local_mods_path):
+    """Install every given modlist entry the mod store has. Returns the entries it could not provide."""
+    missing = []
+    for mod_data in mods:
+        store_key = get_mod_store_key(mod_data)
+        if not store_key or not install_from_mod_store(store_key, os.path.join(local_mods_path, mod_data['filename'])):
+            missing.append(mod_data)
+    save_mod_store_index()
+    return missing
+
+def add_installed_mods_to_store(mods, local_mods_path):
+    """Add the installed files of the given modlist entries to the mod store, e.g. after extracting mods.zip."""
+    if not mod_store_path:
+        return
+    for mod_data in mods:
+        file_path = os.path.join(local_mods_path, mod_data['filename'])
+        store_key = get_mod_store_key(mod_data)
+        if os.path.exists(file_path) and store_key not in _load_mod_store_index():
+            if mod_data.get('sha256') and compute_file_hash(file_path) != mod_data['sha256']:
+                continue
+            add_to_mod_store(store_key, file_path)
+    save_mod_store_index()
 
+class DownloadError(Exception):
+    """Raised for an HTTP status that makes a download attempt fail."""
 
-def download_mod(mod_filename, environment, local_mods_path):
-    """Download a mod file from the Netlify server."""
-    if not urls_initialized:
-        raise RuntimeError("URL configuration not initialized. Ensure load_config() is called first.")
-    if environment == "server":
-        mod_url = f"{url_config["server_mods"]}/{mod_filename}"
-    elif environment == "common":
-        mod_url = f"{url_config["common_mods"]}/{mod_filename}"
-    elif environment == "client":
-        mod_url = f"{url_config["client_mods"]}/{mod_filename}"
-    elif environment == "clientadditional":
-        mod_url = f"{url_config["optional_mods"]}/{mod_filename}"
+    def __init__(self, message, retryable):
+        super().__init__(message)
+        self.retryable = retryable
 
-    response = requests.get(mod_url, stream=True)
-    
-    if response.status_code == 200:
-        mod_path = os.path.join(local_mods_path, mod_filename)
-        with open(mod_path, 'wb') as mod_file:
-            mod_file.write(response.content)
-            # shutil.copyfileobj(response.content, mod_file)
-        # print(f"Downloaded new mod: {response.url}")
+def _load_part_validator(validator_path):
+    try:
+        with open(validator_path, "r") as validator_file:
+            return validator_file.read().strip() or None
+    except OSError:
+        return None
+
+def _save_part_validator(validator_path, response):
+    """Remember the strong ETag, or else the Last-Modified date, of the response a .part file is written from."""
+    etag = response.headers.get("ETag")
+    validator = etag if etag and not etag.startswith("W/") else response.headers.get("Last-Modified")
+    if validator:
+        with open(validator_path, "w") as validator_file:
+            validator_file.write(validator)
     else:
-        print(colored.red(f"Failed to download {mod_filename} from {mod_url}"))
+        removeWithCheck(validator_path, "", "")
+
+async def _download_attempt(mod_url, target_path, expected_sha256):
+    """Run one download attempt, resuming an existing .part file with a Range request.
+
+    A .part file is only resumed with an If-Range of the validator saved when it was started, so a
+    server file that changed in between (as a forced update does) is downloaded again in full
+    instead of being spliced onto the old prefix. A .part file without a validator is discarded.
+    """
+    temp_path = f"{target_path}{PART_SUFFIX}"
+    validator_path = f"{target_path}{PART_VALIDATOR_SUFFIX}"
+    validator = _load_part_validator(validator_path)
+    if os.path.exists(temp_path) and not validator:
+        removeWithCheck(temp_path, "", "")
+    offset = os.path.getsize(temp_path) if os.path.exists(temp_path) else 0
+    headers = {"Range": f"bytes={offset}-", "If-Range": validator} if offset else {}
+
+    response = await asyncio.to_thread(get_session().get, mod_url, stream=True, headers=headers, timeout=DOWNLOAD_TIMEOUT)
+    with response:
+        if response.status_code == 206 and not response.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+            removeWithCheck(temp_path, "", "")
+            raise DownloadError(f"unexpected Content-Range {response.headers.get('Content-Range')!r}", retryable=True)
+        if response.status_code == 416:
+            # The partial file is not a prefix of the current file (complete, or the file changed)
+            removeWithCheck(temp_path, "", "")
+            raise DownloadError("partial download no longer matches the server file", retryable=True)
+        if response.status_code not in (200, 206):
+            raise DownloadError(f"HTTP {response.status_code}", retryable=response.status_code in RETRYABLE_STATUS_CODES)
+        if offset and response.status_code == 206:
+            print(f"Resuming {os.path.basename(target_path)} at {offset} bytes")
+        elif offset:
+            print(f"{os.path.basename(target_path)} changed on the server, restarting its download")
+        if response.status_code == 200:
+            await asyncio.to_thread(_save_part_validator, validator_path, response)
+        received = await stream_to_file_async(response, target_path, expected_sha256)
+        removeWithCheck(validator_path, "", "")
+        return received
+
+async def download_mod_async(mod_filename, environment, local_mods_path, expected_sha256=None, retries=DEFAULT_DOWNLOAD_RETRIES):
+    """Download a mod file from the Netlify server, verifying expected_sha256 if given. Returns True on success.
+
+    Failed attempts are retried with exponential backoff, resuming from the .part file.
+    """
+    base_url = get_environment_base_url(environment)
+    if base_url is None:
+        print(colored.red(f"Unknown environment for downloading {mod_filename}: {environment}"))
+        return False
+    mod_url = f"{base_url}/{mod_filename}"
+    target_path = os.path.join(local_mods_path, mod_filename)
+    with profiling.span(mod_url, "download", bytes=0, attempts=0) as event:
+        for attempt in range(retries + 1):
+            if attempt:
+                delay = RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1)
+                print(colored.yellow(f"Retrying {mod_filename} in {delay:g}s (attempt {attempt + 1} of {retries + 1})"))
+                await asyncio.sleep(delay)
+            event["attempts"] += 1
+            try:
+                event["bytes"] += await _download_attempt(mod_url, target_path, expected_sha256)
+                return True
+            except DownloadError as e:
+                print(colored.red(f"Failed to download {mod_filename} from {mod_url}: {e}"))
+                if not e.retryable:
+                    return False
+            except (requests.RequestException, OSError, HashMismatchError) as e:
+                print(colored.red(f"Failed to download {mod_filename} from {mod_url}: {e}"))
+        return False
+
+def download_mod(mod_filename, environment, local_mods_path, expected_sha256=None, retries=DEFAULT_DOWNLOAD_RETRIES):
+    """Synchronous wrapper of download_mod_async."""
+    return run_async(download_mod_async(mod_filename, environment, local_mods_path, expected_sha256, retries))
+
+async def _download_or_link_mod(mod_data, local_mods_path, retries):
+    """Install one modlist entry, from the mod store when it has the file, otherwise from the server."""
+    filename = mod_data['filename']
+    environment = mod_data['environment']
+    store_key = get_mod_store_key(mod_data)
+    if store_key:
+        with profiling.span(filename, "store") as event:
+            event["hit"] = await asyncio.to_thread(install_from_mod_store, store_key, os.path.join(local_mods_path, filename))
+    if store_key and event["hit"]:
+        print(colored.cyan(f"Installed {filename} ({environment}) from the local mod store"))
+        return True
+    if not await download_mod_async(filename, environment, local_mods_path, mod_data.get('sha256'), retries):
+        return False
+    print(colored.cyan(f"Downloaded {filename} ({environment})"))
+    if store_key:
+        await asyncio.to_thread(add_to_mod_store, store_key, os.path.join(local_mods_path, filename))
+    return True
+
+async def _content_length(url):
+    """Return the size of a server file from a HEAD request, or None if unknown."""
+    try:
+        response = await asyncio.to_thread(get_session().head, url, allow_redirects=True, timeout=HTTP_TIMEOUT)
+        return int(response.headers["Content-Length"]) if response.status_code == 200 else None
+    except (requests.RequestException, KeyError, ValueError):
+        return None
+
+async def order_largest_first(downloads, workers):
+    """Return the modlist entries largest first, so a big file never starts last and sets the total time.
+
+    Sizes come from the modlist 'size' column. Missing ones are looked up with concurrent HEAD requests,
+    but only when there are more files than workers, since otherwise every download starts at once.
+    Files the mod store can provide count as size 0. Returns (ordered entries, total bytes or None if unknown).
+    """
+    sizes = [mod_data.get('size') for mod_data in downloads]
+    if mod_store_path:
+        with mod_store_lock:
+            stored_keys = set(_load_mod_store_index())
+        sizes = [0 if get_mod_store_key(mod_data) in stored_keys else size for mod_data, size in zip(downloads, sizes)]
+
+    unknown = [i for i, size in enumerate(sizes) if size is None and get_environment_base_url(downloads[i]['environment'])]
+    if unknown and len(downloads) > workers:
+        semaphore = asyncio.Semaphore(MAX_HTTP_CONNECTIONS)
+
+        async def head(mod_data):
+            async with semaphore:
+                return await _content_length(f"{get_environment_base_url(mod_data['environment'])}/{mod_data['filename']}")
+
+        for i, size in zip(unknown, await asyncio.gather(*(head(downloads[i]) for i in unknown))):
+            sizes[i] = size
+
+    order = sorted(range(len(downloads)), key=lambda i: -(sizes[i] or 0))
+    total_size = None if None in sizes else sum(sizes)
+    return [downloads[i] for i in order], total_size
+
+async def download_mods_async(downloads, local_mods_path, workers=DEFAULT_DOWNLOAD_WORKERS, retries=DEFAULT_DOWNLOAD_RETRIES):
+    """Install a batch of modlist entries concurrently, from the mod store or over the shared session.
+
+    Each entry is a cloud modlist dict ('filename', 'version', 'environment' and optionally
+    'sha256', which is then verified, and 'size'). Duplicate files are fetched once, and the
+    largest files start first. Returns the list of entries that failed.
+    """
+    unique_downloads = list({(mod_data['filename'], mod_data['environment']): mod_data for mod_data in downloads}.values())
+    if not unique_downloads:
+        return []
+
+    workers = max(1, min(workers, MAX_HTTP_CONNECTIONS, len(unique_downloads)))
+    unique_downloads, total_size = await order_largest_first(unique_downloads, workers)
+    size_info = f" ({total_size / 1048576:.1f} MiB)" if total_size else ""
+    print(f"Downloading {len(unique_downloads)} mod files{size_info} with {workers} parallel connections...")
+    semaphore = asyncio.Semaphore(workers)
+
+    async def install(mod_data):
+        async with semaphore:
+            try:
+                return await _download_or_link_mod(mod_data, local_mods_path, retries)
+            except Exception as e:
+                print(colored.red(f"Failed to download {mod_data['filename']}: {e}"))
+                return False
+
+    results = await asyncio.gather(*(install(mod_data) for mod_data in unique_downloads))
+    failed = [mod_data for mod_data, succeeded in zip(unique_downloads, results) if not succeeded]
+    await asyncio.to_thread(save_mod_store_index)
+
+    if failed:
+        print(colored.red(f"{len(failed)} of {len(unique_downloads)} downloads failed:"))
+        for mod_data in failed:
+            print(colored.red(f"  - {mod_data['filename']} ({mod_data['environment']})"))
+        print(colored.yellow("Run the updater again to retry them; partial downloads will be resumed."))
+    return failed
+
+def download_mods(downloads, local_mods_path, workers=DEFAULT_DOWNLOAD_WORKERS, retries=DEFAULT_DOWNLOAD_RETRIES):
+    """Synchronous wrapper of download_mods_async."""
+    return run_async(download_mods_async(downloads, local_mods_path, workers, retries))
+
+FORCE_UPDATE_ENVIRONMENT_FLAGS = {"server": "s", "common": "c", "client": "r", "clientadditional": "a"}
+
+def parse_force_update_entries(text):
+    """Parse forceupdate.txt into {mod_id: [flags, randomSequence]}.
+
+    Lines are either 'flags modid randomSequence', where flags is a combination of s/c/r/a
+    (server, common, client, clientadditional), or 'modid randomSequence' for every environment
+    (flags ""). A later line for the same mod ID replaces the earlier one.
+    """
+    entries = {}
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) == 3 and set(parts[0]) <= set(FORCE_UPDATE_ENVIRONMENT_FLAGS.values()):
+            flags, mod_id, randomSequence = parts
+            entries[mod_id] = [flags, randomSequence]
+        elif len(parts) >= 2:
+            mod_id, randomSequence = line.split(maxsplit=1)
+            entries[mod_id] = ["", randomSequence.strip()]
+    return entries
+
+def force_update_applies(flags, environments):
+    """Return whether a force update with the given flags targets any of the environments; no flags means all."""
+    return not flags or any(FORCE_UPDATE_ENVIRONMENT_FLAGS.get(environment, "") in flags for environment in environments)
+
+def filter_force_update_entries(entries, environments=None):
+    """Return {mod_id: randomSequence} for the entries that apply to the environments (all when None)."""
+    force_update_list = {}
+    for mod_id, entry in entries.items():
+        flags, randomSequence = entry
+        if environments is None or force_update_applies(flags, environments):
+            force_update_list[mod_id] = randomSequence
+    return force_update_list
+
+def parse_force_update_list(text, environments=None):
+    """Parse forceupdate.txt into {mod_id: randomSequence}, keeping the entries for the given environments."""
+    return filter_force_update_entries(parse_force_update_entries(text), environments)
+
+def getForceUpdateCharSequences(environments=None):
+    print(f"Fetching forceupdate.txt from {url_config['force_update']}")
+    # The unfiltered entries are cached, so a change of environments does not need a refetch
+    entries = fetch_cached_document(url_config["force_update"], parse_force_update_entries, "force-update fetch")
+    if entries is None:
+        print(colored.red(f"Failed to fetch forceupdate.txt from {url_config['force_update']}"))
+        return {}
+    return filter_force_update_entries(entries, environments)
 
-def updateWhenForceUpdate(mod_id: str, log_file_path: str) -> str:
+def get_cloud_force_update(mod_id: str) -> str:
+    """Return the cloud force update sequence of a mod, or "" when it has none."""
     global cached_cloud_force_update_list
-
     if cached_cloud_force_update_list is None:
         cached_cloud_force_update_list = getForceUpdateCharSequences()
-    if not cached_cloud_force_update_list: return ""
-    for cloud_mod_id, randomSeqeunce in cached_cloud_force_update_list.items():
-        if cloud_mod_id != mod_id: continue
-        if get_recent_force_update(mod_id , log_file_path) != randomSeqeunce:
-            return randomSeqeunce
-        if get_recent_force_update(mod_id, log_file_path) == randomSeqeunce:
-            return randomSeqeunce
-    return ""
-
-def getForceUpdateCharSequences():
-    response = requests.get(url_config["force_update"])
-
-    if response.status_code == 200:
-        print(f"Fetching forceupdate.txt from {url_config["force_update"]}")
-        modlist_lines = response.text.splitlines()
-        modlist_dict = {}
-
-        for line in modlist_lines:
-            parts = line.split(maxsplit=1)
-            if len(parts) == 2:
-                mod_id, randomSequence = parts
-                modlist_dict[mod_id] = randomSequence
-        return modlist_dict
-    else:
-        print(colored.red(f"Failed to fetch forceupdate.txt from {url_config["force_update"]}"))
-    return {}
-# def getForceUpdateCharSequences(mod_id: str, valid_environments: list[str]):
-    valid_environment_keys = {}
-    for valid_environment in valid_environments:
-        current_key = ""
-        if valid_environment == "server":
-            current_key = "s"
-        if valid_environment == "common":
-            current_key = "c"
-        if valid_environment == "client":
-            current_key = "r"
-        if valid_environment == "clientadditional":
-            current_key = "a"
-        if not valid_environment_keys.__contains__(current_key):
-            valid_environment_keys.update(current_key)
-            
-    response = requests.get(NETLIFY_FORCE_UPDATE_LIST_URL)
-
-    if response.status_code == 200:
-        print(f"Fetching forceupdate.txt from {NETLIFY_FORCE_UPDATE_LIST_URL}")
-        modlist_lines = response.text.splitlines()
-        modlist_dict = {}
-
-        for line in modlist_lines:
-            parts = line.split(maxsplit=2)
-            if len(parts) == 3:
-                environments, mod_id2, randomSequence = parts
-                chars = list(environments)
-                for key in valid_environment_keys:
-                    if chars.__contains__(key):
-                        modlist_dict[mod_id] = {"randomSequence": f"{randomSequence}"}
-        return modlist_dict
-    else:
-        print(f"Failed to fetch forceupdate.txt from {NETLIFY_FORCE_UPDATE_LIST_URL}")
-    return {}
+    return cached_cloud_force_update_list.get(mod_id, "")
 
 def get_recent_force_update(mod_id: str, log_file_path: str) -> str:
+    """Return the force update sequence last applied to a mod, or "" when none was."""
     global cached_force_update_log
     if cached_force_update_log is None:
         cached_force_update_log = get_force_update_log(log_file_path)
-    if cached_force_update_log:
-        log = cached_force_update_log
-        return log.get(mod_id, "")
-    return ""
+    return cached_force_update_log.get(mod_id, "")
 
 def get_force_update_log(log_file_path: str):
     if os.path.exists(log_file_path):
@@ -519,20 +1452,21 @@ def get_force_update_log(log_file_path: str):
         print("No cloud forced update log found")
     return {}
 
-def writeForceUpdateLog(log_file_path: str, force_update_log: dict):
-    if force_update_log == {}:
-        global cached_cloud_force_update_list
+def update_force_update_log(log_file_path: str, applied: dict):
+    """Merge the force update sequences applied this run into the log and write it atomically.
 
-        if cached_cloud_force_update_list is None:
-            cached_cloud_force_update_list = getForceUpdateCharSequences()
-            force_update_log = cached_cloud_force_update_list
-    if os.path.exists(log_file_path):
-        print("Rewriting cloud forced update log")
-    else:
-        print("Creating cloud forced upate log")
+    Entries of mods that were not touched are kept. The file is only rewritten when an entry changed.
+    """
+    global cached_force_update_log
+    if cached_force_update_log is None:
+        cached_force_update_log = get_force_update_log(log_file_path)
+    changed = {mod_id: sequence for mod_id, sequence in applied.items() if cached_force_update_log.get(mod_id) != sequence}
+    if not changed:
+        return
+    cached_force_update_log = {**cached_force_update_log, **changed}
+    print(f"Recording {len(changed)} applied cloud force updates")
     os.makedirs(os.path.dirname(log_file_path), exist_ok=True)
-    with open(log_file_path, "w") as log_file:
-        json.dump(force_update_log, log_file, indent=4)
+    file_utils.write_json_atomically(log_file_path, cached_force_update_log)
 
 def removeWithCheck(path, message: str, error: str):
     try:
@@ -544,6 +1478,15 @@ def removeWithCheck(path, message: str, error: str):
     except FileNotFoundError:
         if error != "": print(colored.yellow(error))
 
-def safe_exit():
-    input("\nPress Enter to exit...")
-    sys.exit()
\ No newline at end of file
+def ask(prompt, default):
+    """Ask the user a y/n question; in non-interactive mode answer with the default (or "y" with assume_yes)."""
+    if non_interactive:
+        answer = "y" if assume_yes else default
+        print(f"{prompt}{answer} (non-interactive)")
+        return answer
+    return input(prompt).strip().lower()
+
+def safe_exit(exit_code=EXIT_OK):
+    if not non_interactive:
+        input("\nPress Enter to exit...")
+    sys.exit(exit_code)
\ No newline at end of file
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+import re
+import toml
+
+MAX_CACHED_ENTRIES = 4096
+metadata_cache = {}  # (CRC-32, size) of a mods.toml entry -> (modId, version)
+
+MODS_TABLE_HEADER = re.compile(r"\s*\[\[\s*mods\s*\]\]\s*(#.*)?$")
+MODS_KEY = re.compile(r"""\s*["']?mods["']?\s*[.=]""")
+SIMPLE_VALUE_LINE = re.compile(r"""\s*(modId|version)\s*=\s*(?:"([^"\\]*)"|'([^']*)')\s*(#.*)?$""")
+WANTED_KEY = re.compile(r"""\s*["']?(modId|version)["']?\s*[.=]""")
+QUOTED_KEY = re.compile(r"""\s*["']""")
+MULTILINE_DELIMITERS = ("'''", '"""')
+
+class AmbiguousTomlError(Exception):
+    """Raised when the line scan cannot be sure to agree with a full TOML parse."""
+
+def scan_first_mod(text):
+    """Return (modId, version) of the first [[mods]] table by scanning lines, without parsing the whole file.
+
+    Only plain one-line string values are accepted. Anything the scan cannot be certain about
+    (escapes, quoted or dotted keys, an inline 'mods' array, a multi-line value for one of the
+    wanted keys, a missing key) raises AmbiguousTomlError.
+    """
+    values = {}
+    in_first_mods = False
+    open_delimiter = None
+    for line in text.splitlines():
+        if open_delimiter:
+            # Inside a multi-line string such as a description block
+            if line.count(open_delimiter) % 2:
+                open_delimiter = None
+            continue
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+
+        opened = [delimiter for delimiter in MULTILINE_DELIMITERS if line.count(delimiter) % 2]
+        if opened:
+            if len(opened) > 1 or (in_first_mods and WANTED_KEY.match(line)):
+                raise AmbiguousTomlError(line)
+            open_delimiter = opened[0]
+            continue
+
+        if stripped.startswith("["):
+            if in_first_mods:
+                break  # End of the first [[mods]] table (or a nested array the scan does not follow)
+            if MODS_TABLE_HEADER.match(line):
+                in_first_mods = True
+            elif stripped.replace(" ", "").startswith(("[mods", "[[mods")):
+                raise AmbiguousTomlError(line)
+            continue
+
+        if not in_first_mods:
+            if MODS_KEY.match(line):
+                raise AmbiguousTomlError(line)
+            continue
+        match = SIMPLE_VALUE_LINE.match(line)
+        if match:
+            if match.group(1) in values:
+                raise AmbiguousTomlError(f"duplicate key {match.group(1)}")
+            values[match.group(1)] = match.group(2) if match.group(2) is not None else match.group(3)
+        elif WANTED_KEY.match(line) or QUOTED_KEY.match(line):
+            raise AmbiguousTomlError(line)
+
+    if open_delimiter or "modId" not in values or "version" not in values:
+        raise AmbiguousTomlError("first [[mods]] table not fully read")
+    return values["modId"] or None, values["version"] or None
+
+def parse_first_mod(text):
+    """Return (modId, version) of the first [[mods]] entry with a full TOML parse."""
+    mod_info = toml.loads(text)
+    # Extract only the first [[mods]] entry (ignore dependencies)
+    mods_section = mod_info.get("mods", [])
+    if not mods_section or not isinstance(mods_section, list):
+        return None, None
+    return mods_section[0].get("modId") or None, mods_section[0].get("version") or None
+
+def read_first_mod(jar, entry_name):
+    """Return (modId, version) of the first [[mods]] entry of a mods.toml in an open JarReader or ZipFile.
+
+    Results are memoized by the entry's CRC-32 and size from the zip directory, so the same
+    mods.toml in a rebuilt JAR is neither inflated nor parsed again.
+    """
+    info = jar.getinfo(entry_name)
+    key = (info.CRC, info.file_size)
+    if key in metadata_cache:
+        return metadata_cache[key]
+    text = jar.read(entry_name).decode('utf-8')
+    try:
+        result = scan_first_mod(text)
+    except AmbiguousTomlError:
+        result = parse_first_mod(text)
+    if len(metadata_cache) >= MAX_CACHED_ENTRIES:
+        metadata_cache.clear()
+    metadata_cache[key] = result
+    return result
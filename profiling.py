@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+import os
+import time
+import asyncio
+import threading
+import contextlib
+import colored_prints as colored
+import file_utils
+
+events = []
+events_lock = threading.Lock()
+run_start = time.perf_counter()
+
+SLOWEST_ITEMS = 5
+DETAIL_CATEGORIES = ("modlist fetch", "force-update fetch", "scan", "download", "extract", "store")
+
+@contextlib.contextmanager
+def span(name, category, **args):
+    """Time the enclosed block as an event; the yielded dict can be filled with args such as 'bytes'."""
+    start = time.perf_counter()
+    try:
+        yield args
+    finally:
+        record(name, category, start, time.perf_counter() - start, **args)
+
+def record(name, category, start, duration, pid=None, **args):
+    """Record an event measured with time.perf_counter(), possibly in another process (pid)."""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None  # No event loop in this thread
+    # Concurrent tasks share the loop thread, so give each one its own row in the trace
+    event = {"name": name, "category": category, "start": start, "duration": duration,
+             "pid": pid or os.getpid(), "tid": id(task) if task else threading.get_ident(), "args": args}
+    with events_lock:
+        events.append(event)
+
+def reset():
+    global run_start
+    with events_lock:
+        events.clear()
+    run_start = time.perf_counter()
+
+def summarize():
+    """Return one row per phase, then per detail category: count, summed and max duration, slowest item, bytes and throughput."""
+    with events_lock:
+        snapshot = sorted(events, key=lambda event: (event["category"] != "phase", event["start"]))
+    categories = {}
+    for event in snapshot:
+        label = event["name"] if event["category"] == "phase" else event["category"]
+        row = categories.setdefault(label, {"phase": label, "count": 0, "seconds": 0.0, "max_seconds": 0.0, "slowest": None, "bytes": 0})
+        row["count"] += 1
+        row["seconds"] += event["duration"]
+        row["bytes"] += event["args"].get("bytes", 0)
+        if event["duration"] >= row["max_seconds"]:
+            row["max_seconds"] = event["duration"]
+            row["slowest"] = event["name"]
+    for row in categories.values():
+        row["mib_per_second"] = row["bytes"] / 1048576 / row["seconds"] if row["bytes"] and row["seconds"] else None
+    return list(categories.values())
+
+def slowest_items(limit=SLOWEST_ITEMS):
+    with events_lock:
+        detailed = [event for event in events if event["category"] in DETAIL_CATEGORIES]
+    return sorted(detailed, key=lambda event: event["duration"], reverse=True)[:limit]
+
+def print_summary():
+    """Print a table of where the time went; concurrent items overlap, so their sums can exceed the wall time."""
+    print(f"\nProfile ({time.perf_counter() - run_start:.2f}s wall time)")
+    header = f"{'phase':<28}{'count':>7}{'total s':>10}{'max s':>9}{'MiB':>10}{'MiB/s':>9}  slowest"
+    print(header)
+    print("-" * len(header))
+    for row in summarize():
+        mib = f"{row['bytes'] / 1048576:.2f}" if row["bytes"] else "-"
+        throughput = f"{row['mib_per_second']:.2f}" if row["mib_per_second"] else "-"
+        print(f"{row['phase']:<28}{row['count']:>7}{row['seconds']:>10.3f}{row['max_seconds']:>9.3f}{mib:>10}{throughput:>9}  {row['slowest'] if row['count'] > 1 else ''}")
+    slowest = slowest_items()
+    if slowest:
+        print(colored.cyan("Slowest items:"))
+        for event in slowest:
+            print(f"  {event['duration']:8.3f}s  {event['category']:<18} {event['name']}")
+
+def write_report(path, report_format="json"):
+    """Write the recorded events as a JSON report or as a Chrome trace (chrome://tracing, Perfetto)."""
+    with events_lock:
+        snapshot = list(events)
+    if report_format == "chrome":
+        # Complete ("X") events with microsecond timestamps relative to the start of the run
+        report = {"traceEvents": [{"name": event["name"], "cat": event["category"], "ph": "X",
+                                   "ts": round((event["start"] - run_start) * 1e6), "dur": round(event["duration"] * 1e6),
+                                   "pid": event["pid"], "tid": event["tid"], "args": event["args"]} for event in snapshot],
+                  "displayTimeUnit": "ms"}
+    else:
+        report = {"wall_seconds": time.perf_counter() - run_start, "summary": summarize(),
+                  "events": [dict(event, start=event["start"] - run_start) for event in snapshot]}
+    file_utils.write_json_atomically(path, report)
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import math
+import heapq
+import uuid
+import zipfile
+import argparse
+import multiprocessing
+import concurrent.futures
+import mod_updater_core as core
+import colored_prints as colored
+import file_utils
+
+ENVIRONMENTS = ("server", "common", "client", "clientadditional")
+DEFAULT_PART_SIZE_MB = 64
+PUBLISH_INDEX_FOLDER = ".publish_index"
+PARTS_STATE_FILE = "parts.json"
+MAX_CHANGELOG_ENTRIES = 100
+ZIP_ARCHIVE_OVERHEAD = 22  # End of central directory record
+ZIP_ENTRY_OVERHEAD = 30 + 46  # Local file header and central directory header, plus the name twice
+
+def load_json(path, default):
+    try:
+        with open(path, "r") as json_file:
+            return json.load(json_file)
+    except (OSError, json.JSONDecodeError):
+        return default
+
+def scan_environment(source_path, index_path, workers):
+    """Return {mod_id: {filename, version, sha256, size}} for the JARs of one source folder, warning about unusable ones."""
+    installed_mods = core.get_installed_mods(source_path, index_path, use_content_hash=True, workers=workers)
+    mods = {}
+    identified_files = set()
+    for mod_id, (filenames, versions, hashes) in sorted(installed_mods.items()):
+        identified_files.update(filenames)
+        if mod_id == "unknown" or not all(versions):
+            for filename in filenames:
+                print(colored.yellow(f"Skipping {filename}: {'no mod ID' if mod_id == 'unknown' else 'no version'} in its metadata"))
+            continue
+        if len(filenames) > 1:
+            print(colored.red(f"Mod {mod_id} has several JARs in {source_path}: {', '.join(filenames)}. Keep exactly one."))
+            return None
+        if any(character.isspace() for character in mod_id + versions[0]):
+            print(colored.yellow(f"Skipping {filenames[0]}: whitespace in mod ID or version cannot be written to modlist.txt"))
+            continue
+        mods[mod_id] = {"filename": filenames[0], "version": versions[0], "sha256": hashes[0],
+                        "size": os.path.getsize(os.path.join(source_path, filenames[0]))}
+    for filename in sorted(f for f in os.listdir(source_path) if f.endswith(".jar") and f not in identified_files):
+        print(colored.yellow(f"Skipping {filename}: no mod metadata found"))
+    return mods
+
+def format_modlist(mods):
+    """Return modlist.txt lines in the 'modid version sha256 size filename' format."""
+    return "".join(f"{mod_id} {mod['version']} {mod['sha256']} {mod['size']} {mod['filename']}\n" for mod_id, mod in sorted(mods.items()))
+
+def plan_zip_parts(mods, part_size):
+    """Split the JARs into as few parts under part_size as possible with balanced sizes (LPT bin packing).
+
+    Files are assigned largest first to the currently smallest part. When a part still exceeds the cap,
+    the packing is retried with one more part. A single JAR larger than the cap gets a part of its own.
+    Returns a list of parts, each a sorted list of filenames.
+    """
+    files = sorted(((mod["size"] + ZIP_ENTRY_OVERHEAD + 2 * len(mod["filename"]), mod["filename"]) for mod in mods.values()),
+                   key=lambda item: (-item[0], item[1]))
+    if not files:
+        return []
+    part_count = max(1, math.ceil(sum(size for size, _ in files) / max(1, part_size - ZIP_ARCHIVE_OVERHEAD)))
+    while True:
+        parts = [[] for _ in range(part_count)]
+        part_sizes = [(ZIP_ARCHIVE_OVERHEAD, index) for index in range(part_count)]
+        for size, filename in files:
+            part_size_so_far, index = heapq.heappop(part_sizes)
+            parts[index].append(filename)
+            heapq.heappush(part_sizes, (part_size_so_far + size, index))
+        if all(size <= part_size or len(parts[index]) == 1 for size, index in part_sizes) or part_count >= len(files):
+            return [sorted(part) for part in parts if part]
+        part_count += 1
+
+def write_zip_part(zip_path, source_path, filenames):
+    """Write a STORED zip of the given JARs (they are compressed already) atomically."""
+    with file_utils.atomic_path(zip_path) as temp_path:
+        with zipfile.ZipFile(temp_path, "w", zipfile.ZIP_STORED) as zip_file:
+            for filename in filenames:
+                zip_file.write(os.path.join(source_path, filename), filename)
+
+def publish_files(mods, source_path, output_path):
+    """Hardlink (or copy) the JARs into the published folder and remove JARs that are no longer listed."""
+    os.makedirs(output_path, exist_ok=True)
+    published = {mod["filename"] for mod in mods.values()}
+    for filename in published:
+        source_file = os.path.join(source_path, filename)
+        target_file = os.path.join(output_path, filename)
+        if os.path.exists(target_file):
+            if os.path.samefile(source_file, target_file):
+                continue
+            source_stat, target_stat = os.stat(source_file), os.stat(target_file)
+            if (source_stat.st_size, source_stat.st_mtime_ns) == (target_stat.st_size, target_stat.st_mtime_ns):
+                continue
+        file_utils.link_or_copy(source_file, target_file)
+    for filename in os.listdir(output_path):
+        if filename.endswith(".jar") and filename not in published:
+            os.remove(os.path.join(output_path, filename))
+
+def load_published_modlist(output_path, environment):
+    """Return the previously published modlist of an environment, with hashes of the published files where the list has none."""
+    modlist_path = os.path.join(output_path, "modlist.txt")
+    if not os.path.exists(modlist_path):
+        return {}
+    with open(modlist_path, "r") as modlist_file:
+        previous = core.parse_modlist(modlist_file.read(), environment)
+    for mod in previous.values():
+        published_file = os.path.join(output_path, mod["filename"])
+        if not mod.get("sha256") and os.path.exists(published_file):
+            mod["sha256"] = core.compute_file_hash(published_file)
+    return previous
+
+def diff_modlists(previous, mods, environment):
+    """Return changelog changes turning the previous modlist of an environment into the new one."""
+    changes = []
+    for mod_id, mod in sorted(mods.items()):
+        old = previous.get(mod_id)
+        if old and (old["version"], old["filename"], old.get("sha256")) == (mod["version"], mod["filename"], mod["sha256"]):
+            continue
+        changes.append({"op": "change" if old else "add", "environment": environment, "modid": mod_id, "version": mod["version"],
+                        "filename": mod["filename"], "sha256": mod["sha256"], "size": mod["size"]})
+    for mod_id in sorted(set(previous) - set(mods)):
+        changes.append({"op": "remove", "environment": environment, "modid": mod_id})
+    return changes
+
+def rebuilt_without_version_bump(previous, mods):
+    """Return the mod IDs whose bytes changed while version and filename stayed the same."""
+    return sorted(mod_id for mod_id, mod in mods.items()
+                  if mod_id in previous and previous[mod_id].get("sha256")
+                  and (previous[mod_id]["version"], previous[mod_id]["filename"]) == (mod["version"], mod["filename"])
+                  and previous[mod_id]["sha256"] != mod["sha256"])
+
+def load_force_update_entries(force_update_path):
+    if not os.path.exists(force_update_path):
+        return {}
+    with open(force_update_path, "r") as force_update_file:
+        return core.parse_force_update_entries(force_update_file.read())
+
+def write_force_update_entries(force_update_path, entries):
+    """Write forceupdate.txt as 'flags modid sequence' lines; entries without flags keep the 'modid sequence' form."""
+    file_utils.write_text_atomically(force_update_path, "".join(f"{flags} {mod_id} {sequence}\n" if flags else f"{mod_id} {sequence}\n"
+                                                     for mod_id, (flags, sequence) in sorted(entries.items())))
+
+def append_changelog(changelog_path, changes):
+    """Append the changes as a new revision of changelog.json, keeping the last MAX_CHANGELOG_ENTRIES revisions."""
+    changelog = load_json(changelog_path, None)
+    if not isinstance(changelog, dict) or not isinstance(changelog.get("revision"), int):
+        changelog = {"revision": 0, "entries": []}
+    if not changes and changelog["revision"]:
+        return changelog["revision"]
+    changelog["revision"] += 1
+    changelog["entries"] = (changelog.get("entries", []) + [{"revision": changelog["revision"], "changes": changes}])[-MAX_CHANGELOG_ENTRIES:]
+    file_utils.write_json_atomically(changelog_path, changelog)
+    return changelog["revision"]
+
+def publish_zip_parts(mods, source_path, output_path, part_size, parts_state, workers):
+    """Write mods.zip, mods1.zip, ... and parts.txt, skipping parts whose contents did not change."""
+    parts = plan_zip_parts(mods, part_size)
+    hashes = {mod["filename"]: mod["sha256"] for mod in mods.values()}
+    part_names = [core.zip_part_name("mods.zip", index) for index in range(len(parts))]
+    new_state = {}
+    jobs = []
+    for part_name, filenames in zip(part_names, parts):
+        contents = [[filename, hashes[filename]] for filename in filenames]
+        new_state[part_name] = contents
+        if parts_state.get(part_name) != contents or not os.path.exists(os.path.join(output_path, part_name)):
+            jobs.append((part_name, filenames))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(workers, len(jobs) or 1))) as executor:
+        futures = [executor.submit(write_zip_part, os.path.join(output_path, part_name), source_path, filenames) for part_name, filenames in jobs]
+        for future in futures:
+            future.result()
+
+    for filename in os.listdir(output_path):
+        if filename.endswith(".zip") and filename not in part_names:
+            os.remove(os.path.join(output_path, filename))
+    file_utils.write_text_atomically(os.path.join(output_path, core.ZIP_PARTS_MANIFEST), "".join(f"{part_name}\n" for part_name in part_names))
+    sizes_by_file = {mod["filename"]: mod["size"] for mod in mods.values()}
+    sizes = [sum(sizes_by_file[filename] for filename in part) for part in parts]
+    if sizes:
+        print(f"  {len(parts)} zip parts ({len(jobs)} rebuilt), {min(sizes) / 1048576:.1f}-{max(sizes) / 1048576:.1f} MiB each")
+    return new_state
+
+def publish(source_path, output_path, part_size, workers):
+    """Publish every environment folder of source_path into output_path/modfiles. Returns an exit code."""
+    modfiles_path = os.path.join(output_path, "modfiles")
+    index_folder = os.path.join(source_path, PUBLISH_INDEX_FOLDER)
+    os.makedirs(index_folder, exist_ok=True)
+    parts_state_path = os.path.join(index_folder, PARTS_STATE_FILE)
+    parts_state = load_json(parts_state_path, {})
+    force_update_path = os.path.join(modfiles_path, "forceupdate.txt")
+    force_update_entries = load_force_update_entries(force_update_path)
+
+    environments = [environment for environment in ENVIRONMENTS if os.path.isdir(os.path.join(source_path, environment))]
+    if not environments:
+        print(colored.red(f"No environment folders ({', '.join(ENVIRONMENTS)}) found in {source_path}"))
+        return core.EXIT_CONFIG_ERROR
+
+    scanned = {}
+    for environment in environments:
+        print(f"Scanning {environment}...")
+        mods = scan_environment(os.path.join(source_path, environment), os.path.join(index_folder, f"{environment}.json"), workers)
+        if mods is None:
+            return core.EXIT_FAILED
+        scanned[environment] = mods
+    mod_environments = {}
+    for environment, mods in scanned.items():
+        for mod_id in mods:
+            mod_environments.setdefault(mod_id, []).append(environment)
+    for mod_id, found_in in sorted(mod_environments.items()):
+        if len(found_in) > 1:
+            print(colored.yellow(f"Mod {mod_id} is published in several environments ({', '.join(found_in)}); clients use the last one."))
+
+    changes = []
+    forced_changes = {}  # mod_id -> force change of this run, shared when the mod was rebuilt in several environments
+    for environment, mods in scanned.items():
+        environment_output = os.path.join(modfiles_path, environment)
+        os.makedirs(environment_output, exist_ok=True)
+        previous = load_published_modlist(environment_output, environment)
+        changes += diff_modlists(previous, mods, environment)
+        for mod_id in rebuilt_without_version_bump(previous, mods):
+            change = forced_changes.get(mod_id)
+            if change is None:
+                change = forced_changes[mod_id] = {"op": "force", "modid": mod_id, "sequence": uuid.uuid4().hex[:16], "flags": ""}
+                changes.append(change)
+            change["flags"] = "".join(flag for flag in core.FORCE_UPDATE_ENVIRONMENT_FLAGS.values()
+                                      if flag in change["flags"] or flag == core.FORCE_UPDATE_ENVIRONMENT_FLAGS[environment])
+            force_update_entries[mod_id] = [change["flags"], change["sequence"]]
+            print(colored.cyan(f"  {mod_id}: bytes changed without a version bump, adding a force update"))
+
+        print(f"Publishing {environment}: {len(mods)} mods")
+        publish_files(mods, os.path.join(source_path, environment), environment_output)
+        parts_state[environment] = publish_zip_parts(mods, os.path.join(source_path, environment), environment_output,
+                                                     part_size, parts_state.get(environment, {}), workers)
+        file_utils.write_text_atomically(os.path.join(environment_output, "modlist.txt"), format_modlist(mods))
+
+    write_force_update_entries(force_update_path, force_update_entries)
+    revision = append_changelog(os.path.join(modfiles_path, "changelog.json"), changes)
+    file_utils.write_json_atomically(parts_state_path, parts_state)
+    print(colored.green(f"Published revision {revision} with {len(changes)} changes to {modfiles_path}"))
+    return core.EXIT_OK
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Publish a modpack: scan <source>/<environment>/*.jar and write the modfiles tree the updater downloads.")
+    parser.add_argument("source", help=f"folder with one subfolder of JARs per environment ({', '.join(ENVIRONMENTS)})")
+    parser.add_argument("output", help="web root to write modfiles/ into")
+    parser.add_argument("--part-size-mb", type=int, default=DEFAULT_PART_SIZE_MB, help=f"size cap of each mods.zip part (default: {DEFAULT_PART_SIZE_MB})")
+    parser.add_argument("--workers", type=int, default=0, help="scan processes and zip writer threads (default: one per CPU)")
+    args = parser.parse_args(argv)
+    workers = args.workers if args.workers > 0 else os.cpu_count() or 1
+    return publish(os.path.abspath(args.source), os.path.abspath(args.output), args.part_size_mb * 1024 * 1024, workers)
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Required for the scan process pool in PyInstaller builds
+    sys.exit(main())
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import shutil
+import mod_updater_core as core
+import colored_prints as colored
+import file_utils
+
+# Sibling folders of the mods folder; each holds a mods folder plus the updater state files that belong to it
+STAGED_FOLDER = ".mods-staged"
+PREVIOUS_FOLDER = ".mods-previous"
+SWAP_FOLDER = ".mods-swap"
+STAGE_INFO_FILE = "stage.json"
+SWAP_JOURNAL_FILE = "swap.json"
+
+def get_set_path(mods_path, folder):
+    """Return the folder that holds the staged or previous mod set of mods_path."""
+    return os.path.join(os.path.dirname(os.path.abspath(mods_path)), folder)
+
+def get_set_mods_path(mods_path, folder):
+    return os.path.join(get_set_path(mods_path, folder), os.path.basename(os.path.abspath(mods_path)))
+
+def create_stage(mods_path, state_files):
+    """Build a fresh staged set next to mods_path: hardlinks of every file of the mods folder and copies of the state files.
+
+    Downloads and removals in the staged mods folder replace or unlink directory entries only,
+    so the hardlinked live files are never modified. Returns the staged mods folder.
+    """
+    stage_path = get_set_path(mods_path, STAGED_FOLDER)
+    staged_mods_path = get_set_mods_path(mods_path, STAGED_FOLDER)
+    shutil.rmtree(stage_path, ignore_errors=True)
+    os.makedirs(stage_path)
+    if os.path.isdir(mods_path):
+        shutil.copytree(mods_path, staged_mods_path, symlinks=True, copy_function=file_utils.link_or_copy)
+    else:
+        os.makedirs(staged_mods_path)
+    instance_path = os.path.dirname(os.path.abspath(mods_path))
+    for state_file in state_files:
+        if os.path.exists(os.path.join(instance_path, state_file)):
+            shutil.copy2(os.path.join(instance_path, state_file), os.path.join(stage_path, state_file))
+    return staged_mods_path
+
+def discard_stage(mods_path):
+    shutil.rmtree(get_set_path(mods_path, STAGED_FOLDER), ignore_errors=True)
+
+def _live_state(mods_path):
+    return [list(state) for state in core.get_mods_folder_state(mods_path)] if os.path.isdir(mods_path) else None
+
+def mark_stage_ready(mods_path, status):
+    """Record that the staged set is complete, together with the live folder state it was built from."""
+    info = {"status": status, "prepared_at": time.time(), "live_state": _live_state(mods_path)}
+    info_path = os.path.join(get_set_path(mods_path, STAGED_FOLDER), STAGE_INFO_FILE)
+    file_utils.write_json_atomically(info_path, info)
+
+def load_stage_info(mods_path):
+    """Return the info of a complete staged set, or None when nothing is staged."""
+    try:
+        with open(os.path.join(get_set_path(mods_path, STAGED_FOLDER), STAGE_INFO_FILE), "r") as info_file:
+            return json.load(info_file)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+def _finish_exchange(mods_path, journal, state_files):
+    """Second half of an exchange, after the new mods folder is in place; safe to repeat."""
+    instance_path = os.path.dirname(os.path.abspath(mods_path))
+    set_path = get_set_path(mods_path, journal["folder"])
+    swap_path = get_set_path(mods_path, SWAP_FOLDER)
+    for state_file in state_files:
+        source_path = os.path.join(set_path, state_file)
+        target_path = os.path.join(instance_path, state_file)
+        if state_file not in journal["state_files"]:
+            if os.path.exists(target_path):
+                os.remove(target_path)  # The incoming set has none
+        elif os.path.exists(source_path):
+            os.replace(source_path, target_path)
+    shutil.rmtree(set_path, ignore_errors=True)
+    os.remove(os.path.join(swap_path, SWAP_JOURNAL_FILE))
+    os.rename(swap_path, set_path)
+
+def _exchange(mods_path, folder, state_files):
+    """Exchange the live mods folder and state files with the set in folder.
+
+    The live set is moved aside into a journaled swap folder, then the other mods folder is renamed
+    into place: two directory renames, so the switch is near-instant. State files follow only after
+    the new mods folder is live, so a crash can at worst cause redundant work on the next run.
+    """
+    instance_path = os.path.dirname(os.path.abspath(mods_path))
+    swap_path = get_set_path(mods_path, SWAP_FOLDER)
+    shutil.rmtree(swap_path, ignore_errors=True)
+    os.makedirs(swap_path)
+    journal = {"folder": folder, "state_files": [state_file for state_file in state_files
+                                                 if os.path.exists(os.path.join(get_set_path(mods_path, folder), state_file))]}
+    file_utils.write_json_atomically(os.path.join(swap_path, SWAP_JOURNAL_FILE), journal)
+    for state_file in state_files:
+        if os.path.exists(os.path.join(instance_path, state_file)):
+            shutil.copy2(os.path.join(instance_path, state_file), os.path.join(swap_path, state_file))
+
+    swapped_mods_path = os.path.join(swap_path, os.path.basename(os.path.abspath(mods_path)))
+    if os.path.isdir(mods_path):
+        try:
+            os.rename(mods_path, swapped_mods_path)
+        except OSError:
+            shutil.rmtree(swap_path, ignore_errors=True)
+            raise
+    try:
+        os.rename(get_set_mods_path(mods_path, folder), mods_path)
+    except OSError:
+        if os.path.isdir(swapped_mods_path):
+            os.rename(swapped_mods_path, mods_path)
+        shutil.rmtree(swap_path, ignore_errors=True)
+        raise
+    _finish_exchange(mods_path, journal, state_files)
+
+def recover_interrupted_swap(mods_path, state_files):
+    """Complete or undo an exchange that was interrupted, depending on whether the new mods folder was already live."""
+    swap_path = get_set_path(mods_path, SWAP_FOLDER)
+    journal_path = os.path.join(swap_path, SWAP_JOURNAL_FILE)
+    if not os.path.exists(journal_path):
+        if os.path.isdir(swap_path):
+            shutil.rmtree(swap_path, ignore_errors=True)
+        return
+    with open(journal_path, "r") as journal_file:
+        journal = json.load(journal_file)
+    swapped_mods_path = os.path.join(swap_path, os.path.basename(os.path.abspath(mods_path)))
+    if not os.path.isdir(mods_path) and os.path.isdir(swapped_mods_path):
+        print(colored.yellow("Restoring the mods folder after an interrupted swap"))
+        os.rename(swapped_mods_path, mods_path)
+        shutil.rmtree(swap_path, ignore_errors=True)
+    elif os.path.isdir(mods_path) and not os.path.isdir(get_set_mods_path(mods_path, journal["folder"])) and os.path.isdir(swapped_mods_path):
+        print(colored.yellow("Completing an interrupted mods folder swap"))
+        _finish_exchange(mods_path, journal, state_files)
+    else:
+        shutil.rmtree(swap_path, ignore_errors=True)  # Interrupted before the live folder was moved
+
+def commit_stage(mods_path, state_files):
+    """Swap a complete staged set into place and keep the replaced set for rollback.
+
+    Returns "committed", "nothing-staged" or "stale" when the live mods folder changed after the
+    stage was prepared (the stage is then discarded). Raises OSError when a folder is in use.
+    """
+    info = load_stage_info(mods_path)
+    if info is None:
+        return "nothing-staged"
+    if info.get("live_state") != _live_state(mods_path):
+        discard_stage(mods_path)
+        return "stale"
+    _exchange(mods_path, STAGED_FOLDER, state_files)
+    previous_path = get_set_path(mods_path, PREVIOUS_FOLDER)
+    shutil.rmtree(previous_path, ignore_errors=True)
+    os.rename(get_set_path(mods_path, STAGED_FOLDER), previous_path)
+    return "committed"
+
+def rollback(mods_path, state_files):
+    """Exchange the live set with the previous one; rolling back again restores the newer set.
+
+    Returns "rolled-back" or "nothing-to-roll-back".
+    """
+    if not os.path.isdir(get_set_mods_path(mods_path, PREVIOUS_FOLDER)):
+        return "nothing-to-roll-back"
+    _exchange(mods_path, PREVIOUS_FOLDER, state_files)
+    return "rolled-back"
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Tests of the mod metadata lookup order: mods.toml, then a pinned jar, then a jarjar kffmod jar."""
+import io
+import os
+import sys
+import zipfile
+import tempfile
+import unittest
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import mod_updater_core as core
+
+INVALID_MODS_TOML = '[[mods]]\nmodId="outer\nversion="1"\n'  # Unterminated string
+
+
+def build_archive(entries):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in entries:
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+class ReadJarMetadataTest(unittest.TestCase):
+    def read_metadata(self, data):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "mod.jar")
+            with open(path, "wb") as jar_file:
+                jar_file.write(data)
+            with contextlib.redirect_stdout(io.StringIO()):
+                return core.read_jar_metadata(path)
+
+    def test_invalid_mods_toml_falls_back_to_pinned_jar(self):
+        inner = build_archive([("META-INF/mods.toml", '[[mods]]\nmodId="inner"\nversion="2"\n')])
+        data = build_archive([("META-INF/mods.toml", INVALID_MODS_TOML),
+                              ("META-INF/loader.properties", "pinnedFile=/META-INF/jars/inner.jar\n"),
+                              ("META-INF/jars/inner.jar", inner)])
+        self.assertEqual(self.read_metadata(data), {"mod_id": "inner", "version": "2"})
+
+    def test_invalid_mods_toml_without_fallback(self):
+        self.assertEqual(self.read_metadata(build_archive([("META-INF/mods.toml", INVALID_MODS_TOML)])), {"mod_id": None, "version": None})
+
+    def test_mods_toml_that_is_not_utf8(self):
+        self.assertEqual(self.read_metadata(build_archive([("META-INF/mods.toml", b"\xff\xfe[[mods]]")])), {"mod_id": None, "version": None})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Differential tests: JarReader must read what zipfile reads or refuse with JarFormatError so the scan falls back."""
+import io
+import os
+import sys
+import zipfile
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import jar_reader
+
+MODS_TOML = '[[mods]]\nmodId="outer"\nversion="1"\n'
+NESTED_MODS_TOML = '[[mods]]\nmodId="inner"\nversion="2"\n'
+
+
+class UnseekableBuffer(io.RawIOBase):
+    """A write-only stream; zipfile then writes data descriptors after each entry instead of seeking back."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.data += data
+        return len(data)
+
+
+def build_archive(entries, method=zipfile.ZIP_DEFLATED, streamed=False, prepend=b"", comment=b""):
+    """Return the bytes of a zip of (name, data, method) entries; a None method uses the archive's method."""
+    buffer = UnseekableBuffer() if streamed else io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", method) as archive:
+        for name, data, entry_method in entries:
+            archive.writestr(name, data, entry_method)
+        archive.comment = comment
+    return prepend + bytes(buffer.data if streamed else buffer.getvalue())
+
+
+def build_jar(**options):
+    return build_archive([("META-INF/mods.toml", MODS_TOML, None), ("a/Payload.class", os.urandom(2048), None),
+                          ("a/Text.txt", "text " * 500, None)], **options)
+
+
+def build_outer_jar(nested_method, **options):
+    nested = build_archive([("META-INF/mods.toml", NESTED_MODS_TOML, None)], method=nested_method)
+    return build_archive([("META-INF/loader.properties", "pinnedFile=/META-INF/jars/inner.jar\n", None),
+                          ("META-INF/jars/inner.jar", nested, nested_method)], **options)
+
+
+JAR_CASES = {
+    "deflated": build_jar(),
+    "stored": build_jar(method=zipfile.ZIP_STORED),
+    "data descriptors": build_jar(streamed=True),
+    "prepended bytes": build_jar(prepend=b"#!/bin/sh\nexec java -jar \"$0\"\n"),
+    "archive comment": build_jar(comment=b"built by a test " * 100),
+    "streamed with prepended bytes": build_jar(streamed=True, prepend=b"\x00" * 100),
+    "bzip2": build_jar(method=zipfile.ZIP_BZIP2),
+}
+
+NESTED_CASES = {
+    "stored nested jar": build_outer_jar(zipfile.ZIP_STORED),
+    "deflated nested jar": build_outer_jar(zipfile.ZIP_DEFLATED),
+    "stored nested jar, streamed": build_outer_jar(zipfile.ZIP_STORED, streamed=True),
+    "deflated nested jar, prepended bytes": build_outer_jar(zipfile.ZIP_DEFLATED, prepend=b"\xff" * 37),
+}
+
+
+class JarReaderTest(unittest.TestCase):
+    def assertSameContents(self, reader, archive):
+        self.assertEqual(reader.namelist(), archive.namelist())
+        for name in archive.namelist():
+            expected = archive.getinfo(name)
+            try:
+                self.assertEqual(reader.read(name), archive.read(name))
+            except jar_reader.JarFormatError:
+                continue  # Refused entries are read with zipfile by the scan
+            info = reader.getinfo(name)
+            self.assertEqual((info.CRC, info.file_size, info.compress_size, info.compress_type),
+                             (expected.CRC, expected.file_size, expected.compress_size, expected.compress_type))
+
+    def test_reads_what_zipfile_reads(self):
+        for name, data in {**JAR_CASES, **NESTED_CASES}.items():
+            with self.subTest(name):
+                with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                    try:
+                        reader = jar_reader.JarReader(data)
+                    except jar_reader.JarFormatError:
+                        continue
+                    with reader:
+                        self.assertSameContents(reader, archive)
+
+    def test_supported_archives_are_not_refused(self):
+        for name in ("deflated", "stored", "data descriptors", "prepended bytes", "archive comment"):
+            with self.subTest(name):
+                with jar_reader.JarReader(JAR_CASES[name]) as reader:
+                    self.assertEqual(reader.read("META-INF/mods.toml").decode("utf-8"), MODS_TOML)
+
+    def test_streamed_archive_has_data_descriptors(self):
+        with zipfile.ZipFile(io.BytesIO(JAR_CASES["data descriptors"])) as archive:
+            self.assertTrue(archive.getinfo("META-INF/mods.toml").flag_bits & 0x08)
+
+    def test_unsupported_compression_is_refused(self):
+        with jar_reader.JarReader(JAR_CASES["bzip2"]) as reader:
+            with self.assertRaises(jar_reader.JarFormatError):
+                reader.read("META-INF/mods.toml")
+
+    def test_nested_jars_match_zipfile(self):
+        for name, data in NESTED_CASES.items():
+            with self.subTest(name):
+                with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                    with zipfile.ZipFile(io.BytesIO(archive.read("META-INF/jars/inner.jar"))) as expected_nested:
+                        with jar_reader.JarReader(data) as reader:
+                            with reader.open_nested("META-INF/jars/inner.jar") as nested:
+                                self.assertSameContents(nested, expected_nested)
+                                self.assertEqual(nested.read("META-INF/mods.toml").decode("utf-8"), NESTED_MODS_TOML)
+
+    def test_mapped_file_matches_buffer(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "mod.jar")
+            with open(path, "wb") as jar_file:
+                jar_file.write(NESTED_CASES["stored nested jar"])
+            with zipfile.ZipFile(path) as archive, jar_reader.JarReader(path) as reader:
+                self.assertSameContents(reader, archive)
+
+    def test_damaged_archives_are_refused(self):
+        data = JAR_CASES["deflated"]
+        corrupted = JAR_CASES["stored"].replace(b'modId="outer"', b'modId="outex"')
+        for name, broken in (("empty", b""), ("no end record", data[:-30]), ("missing entries", data[:40] + data[-2000:]),
+                             ("corrupted entry", corrupted)):
+            with self.subTest(name):
+                with self.assertRaises(jar_reader.JarFormatError):
+                    with jar_reader.JarReader(broken) as reader:
+                        reader.read("META-INF/mods.toml")
+
+
+if __name__ == "__main__":
+    unittest.main()
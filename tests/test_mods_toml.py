@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Differential tests: the mods.toml line scan must agree with a full TOML parse or hand off to it."""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import mods_toml
+
+# Documents the scan is expected to read itself
+SCANNED_CASES = {
+    "plain": 'modLoader="javafml"\n[[mods]]\nmodId="a"\nversion="1"\n',
+    "literal string and comment": "[[mods]]\nmodId = 'a' # comment\nversion = \"1.0-[x]\"\n",
+    "indented keys": '[[mods]]\n  modId   =   "a"\n\tversion="1"\n',
+    "second mods table": '[[mods]]\nmodId="a"\nversion="1"\n[[mods]]\nmodId="b"\nversion="2"\n',
+    "second table without modId": '[[mods]]\nmodId="a"\nversion="1"\n\n[[mods]]\nversion="9"\n',
+    "subtable": '[[mods]]\nmodId="a"\nversion="1"\n[mods.sub]\nk=1\n',
+    "CRLF": '[[mods]]\r\nmodId="a"\r\nversion="1"\r\n',
+    "header inside a string": 'title="[[mods]]"\n[[mods]]\nmodId="a"\nversion="1"\n',
+    "keys inside a multi-line string": '[[mods]]\ndescription="""\nmodId="x"\n"""\nmodId="a"\nversion="1"\n',
+    "table inside a multi-line string": 'a = """\n[[mods]]\nmodId="fake"\nversion="0"\n"""\n[[mods]]\nmodId="a"\nversion="1"\n',
+    "one-line multi-line string": '[[mods]]\nmodId="a"\ndisplayTest="""x"""\nversion="1"\n',
+    "multi-line string after the keys": '[[mods]]\nmodId="a"\nversion="1"\nk = [ "x",\n"""y\n"""]\n',
+    "empty version": '[[mods]]\nmodId="a"\nversion=""\n',
+}
+
+# Documents the scan must not decide; the full parse (or its error) is authoritative
+AMBIGUOUS_CASES = {
+    "escape in value": '[[mods]]\nmodId="a\\u0062"\nversion="1"\n',
+    "escaped quote in value": '[[mods]]\nmodId="a"\nversion="1\\"2"\n',
+    "quoted key": '[[mods]]\n"modId"="a"\nversion="1"\n',
+    "dotted key": '[[mods]]\nmodId.x="a"\nversion="1"\n',
+    "inline mods array": 'mods=[{modId="a",version="1"}]\n',
+    "multi-line value of a wanted key": '[[mods]]\nmodId="a"\nversion="""\n1"""\n',
+    "multi-line array": '[[mods]]\nauthors=[\n"x",\n]\nmodId="a"\nversion="1"\n',
+    "duplicate key": '[[mods]]\nmodId="a"\nmodId="b"\nversion="1"\n',
+    "missing version": '[[mods]]\nmodId="a"\n',
+    "no mods table": 'modLoader="javafml"\n',
+    "byte order mark": '\ufeff[[mods]]\r\nmodId="a"\r\nversion="1"\r\n',
+    "unbalanced quotes": "[[mods]]\nmodId=\"a\"\nversion=\"1\"\ndesc='''it's \"\"\" here\n'''\n",
+}
+
+
+def full_parse(text):
+    try:
+        return mods_toml.parse_first_mod(text)
+    except Exception as e:
+        return type(e)
+
+
+class ScanFirstModTest(unittest.TestCase):
+    def test_scan_matches_full_parse(self):
+        for name, text in SCANNED_CASES.items():
+            with self.subTest(name):
+                self.assertEqual(mods_toml.scan_first_mod(text), full_parse(text))
+
+    def test_scan_hands_off_when_unsure(self):
+        for name, text in AMBIGUOUS_CASES.items():
+            with self.subTest(name):
+                with self.assertRaises(mods_toml.AmbiguousTomlError):
+                    mods_toml.scan_first_mod(text)
+
+    def test_line_endings_do_not_change_the_result(self):
+        for name, text in SCANNED_CASES.items():
+            with self.subTest(name):
+                self.assertEqual(mods_toml.scan_first_mod(text.replace("\r\n", "\n").replace("\n", "\r\n")), full_parse(text))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""End-to-end tests: publish a pack with publish_pack.py, serve it locally and run the updater against it."""
+import os
+import sys
+import json
+import random
+import shutil
+import tempfile
+import subprocess
+import unittest
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_PATH, "benchmarks"))
+import bench_update
+
+PACK = {"common": ["commonmod1", "commonmod2"], "client": ["clientmod1", "clientmod2"]}
+
+
+class PackUpdateTest(unittest.TestCase):
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp(prefix="modupdater-test-")
+        self.addCleanup(shutil.rmtree, self.work_path, True)
+        self.rng = random.Random(1)
+        self.source_path = os.path.join(self.work_path, "source")
+        self.server_path = os.path.join(self.work_path, "server")
+        self.mods_path = os.path.join(self.work_path, "instance", "mods")
+        os.makedirs(self.mods_path)
+        for environment, mod_ids in PACK.items():
+            os.makedirs(os.path.join(self.source_path, environment))
+            for mod_id in mod_ids:
+                self.write_jar(os.path.join(self.source_path, environment), mod_id, "1.0")
+        self.publish()
+
+        server = bench_update.start_server(self.server_path, bench_update.TrafficCounter())
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.url = f"http://127.0.0.1:{server.server_address[1]}"
+        self.config_path = os.path.join(self.work_path, "instance", "modupdaterconfig.json")
+        self.write_config(useModStore=False)
+
+    def write_config(self, **config):
+        with open(self.config_path, "w") as config_file:
+            json.dump(dict(config, url=self.url), config_file)
+
+    def write_jar(self, folder, mod_id, version, filename=None):
+        jar_path = os.path.join(folder, filename or f"{mod_id}-{version}.jar")
+        with open(jar_path, "wb") as jar_file:
+            jar_file.write(bench_update.build_jar(mod_id, version, "toml", 2048, self.rng))
+        return jar_path
+
+    def edit_modlist(self, environment, mod_id, line):
+        """Replace the modlist line of mod_id by hand, leaving the zip parts and changelog.json as they are."""
+        modlist_path = os.path.join(self.server_path, "modfiles", environment, "modlist.txt")
+        with open(modlist_path, "r") as modlist_file:
+            lines = [existing_line for existing_line in modlist_file if not existing_line.startswith(f"{mod_id} ")]
+        with open(modlist_path, "w") as modlist_file:
+            modlist_file.writelines(lines + [f"{line}\n"])
+        modified = os.path.getmtime(modlist_path) + 10  # Past the one-second resolution of Last-Modified
+        os.utime(modlist_path, (modified, modified))
+
+    def publish(self):
+        subprocess.run([sys.executable, os.path.join(REPO_PATH, "publish_pack.py"), self.source_path, self.server_path],
+                       check=True, capture_output=True)
+
+    def run_updater(self):
+        process = subprocess.run([sys.executable, os.path.join(REPO_PATH, "main.py"), "--json",
+                                  "--mods", self.mods_path, "--config", self.config_path], capture_output=True, text=True)
+        return json.loads(process.stdout)
+
+    def installed_files(self):
+        return sorted(filename for filename in os.listdir(self.mods_path) if filename.endswith(".jar"))
+
+    def test_install_then_up_to_date(self):
+        self.assertEqual(self.run_updater()["status"], "installed")
+        self.assertEqual(self.installed_files(), sorted(f"{mod_id}-1.0.jar" for mod_ids in PACK.values() for mod_id in mod_ids))
+        self.assertEqual(self.run_updater()["status"], "up-to-date")
+
+    def test_hand_edited_modlist_is_applied(self):
+        # A modlist edited on the server without publish_pack.py, so changelog.json does not mention it
+        self.assertEqual(self.run_updater()["status"], "installed")
+        self.write_jar(os.path.join(self.server_path, "modfiles", "client"), "clientmod2", "2.0")
+        self.edit_modlist("client", "clientmod2", "clientmod2 2.0 clientmod2-2.0.jar")
+
+        self.assertEqual(self.run_updater()["status"], "updated")
+        self.assertIn("clientmod2-2.0.jar", self.installed_files())
+        self.assertNotIn("clientmod2-1.0.jar", self.installed_files())
+        self.assertEqual(self.run_updater()["status"], "up-to-date")
+
+    def test_stale_zip_part_is_reconciled(self):
+        # The modlist moved commonmod1 to 1.1 under the same filename, but mods.zip still holds 1.0
+        store_path = os.path.join(self.work_path, "store")
+        self.write_config(modStorePath=store_path)
+        jar_path = self.write_jar(os.path.join(self.server_path, "modfiles", "common"), "commonmod1", "1.1", "commonmod1-1.0.jar")
+        with open(jar_path, "rb") as jar_file:
+            current_bytes = jar_file.read()
+        self.edit_modlist("common", "commonmod1", "commonmod1 1.1 commonmod1-1.0.jar")
+
+        self.assertEqual(self.run_updater()["status"], "installed")
+        with open(os.path.join(self.mods_path, "commonmod1-1.0.jar"), "rb") as jar_file:
+            self.assertEqual(jar_file.read(), current_bytes)
+        stored_files = [os.path.join(folder, filename) for folder, _, filenames in os.walk(store_path)
+                        for filename in filenames if filename == "commonmod1-1.0.jar"]
+        for stored_file in stored_files:
+            with open(stored_file, "rb") as jar_file:
+                self.assertEqual(jar_file.read(), current_bytes)
+        self.assertEqual(self.run_updater()["status"], "up-to-date")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Tests of stream_extract_zip: every member is extracted from a single read of the download."""
+import io
+import os
+import sys
+import shutil
+import zipfile
+import tempfile
+import unittest
+import contextlib
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import mod_updater_core as core
+from test_jar_reader import UnseekableBuffer
+
+ENTRIES = [("first.jar", os.urandom(4096), zipfile.ZIP_DEFLATED), ("second.jar", b"stored " * 300, zipfile.ZIP_STORED),
+           ("third.jar", b"bzip2 " * 300, zipfile.ZIP_BZIP2), ("fourth.jar", os.urandom(2048), zipfile.ZIP_DEFLATED)]
+
+
+def build_archive(entries, streamed=False):
+    buffer = UnseekableBuffer() if streamed else io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data, method in entries:
+            archive.writestr(name, data, method)
+    return bytes(buffer.data if streamed else buffer.getvalue())
+
+
+class FakeResponse:
+    """Stands in for a streamed requests response: raw can only be read forward, once."""
+
+    def __init__(self, data):
+        self.raw = io.BufferedReader(io.BytesIO(data))
+        self.raw.decode_content = False
+
+
+class StreamExtractZipTest(unittest.TestCase):
+    def extract(self, data, spooled=True):
+        folder = tempfile.mkdtemp(prefix="modupdater-test-")
+        self.addCleanup(shutil.rmtree, folder, True)
+        with mock.patch.object(core, "get_session", side_effect=AssertionError("the archive was requested again")):
+            with contextlib.redirect_stdout(io.StringIO()):
+                downloaded = core.stream_extract_zip(FakeResponse(data), "http://example.invalid/mods.zip", folder)
+        if spooled:  # The spool copies the download up to its end
+            self.assertEqual(downloaded, len(data))
+        extracted = {}
+        for name in os.listdir(folder):
+            with open(os.path.join(folder, name), "rb") as extracted_file:
+                extracted[name] = extracted_file.read()
+        return extracted
+
+    def test_streamable_archive(self):
+        entries = [entry for entry in ENTRIES if entry[2] != zipfile.ZIP_BZIP2]
+        self.assertEqual(self.extract(build_archive(entries), spooled=False), {name: data for name, data, _ in entries})
+
+    def test_unsupported_member_finishes_from_the_same_download(self):
+        # first.jar and second.jar stream, third.jar (bzip2) switches the rest to the spool
+        self.assertEqual(self.extract(build_archive(ENTRIES)), {name: data for name, data, _ in ENTRIES})
+
+    def test_data_descriptors(self):
+        self.assertEqual(self.extract(build_archive(ENTRIES, streamed=True)), {name: data for name, data, _ in ENTRIES})
+
+
+if __name__ == "__main__":
+    unittest.main()
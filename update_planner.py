@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+import os
+import mod_updater_core as core
+import colored_prints as colored
+
+
+class UpdatePlan:
+    """Deduplicated set of remove/download/keep actions for one update run."""
+
+    def __init__(self):
+        self.removals = {}  # filename -> action
+        self.downloads = {}  # (filename, environment) -> action
+        self.kept = {}  # mod_id -> action
+
+    def remove(self, mod_id, filename, reason):
+        if filename not in self.removals:
+            self.removals[filename] = {"action": "remove", "mod_id": mod_id, "filename": filename, "reason": reason}
+
+    def download(self, mod_id, mod_data, reason, force_sequence=None):
+        key = (mod_data['filename'], mod_data['environment'])
+        action = self.downloads.get(key)
+        if action is None:
+            self.downloads[key] = {"action": "download", "mod_id": mod_id, "filename": mod_data['filename'], "environment": mod_data['environment'],
+                                   "reason": reason, "mod_data": mod_data, "force_sequence": force_sequence}
+        elif force_sequence:
+            action["force_sequence"] = force_sequence
+
+    def keep(self, mod_id, filename, reason, force_sequence=None):
+        self.kept[mod_id] = {"action": "keep", "mod_id": mod_id, "filename": filename, "reason": reason, "force_sequence": force_sequence}
+
+    def actions(self):
+        """Return every planned action; files that a download replaces in place are not removed first."""
+        replaced = {filename for filename, _ in self.downloads}
+        removals = [action for filename, action in self.removals.items() if filename not in replaced]
+        return removals + list(self.downloads.values()) + list(self.kept.values())
+
+    def summary(self):
+        actions = self.actions()
+        return {action_type: sum(1 for action in actions if action["action"] == action_type) for action_type in ("remove", "download", "keep")}
+
+
+def _force_update_state(mod_id, force_update_log_path):
+    """Return (sequence, forced) for a mod: the cloud force update sequence and whether it still has to be applied."""
+    sequence = core.get_cloud_force_update(mod_id)
+    if sequence == "":
+        return None, False
+    return sequence, sequence != core.get_recent_force_update(mod_id, force_update_log_path)
+
+
+def plan_updates(cloud_mods, installed_mods, config, mods_path, force_update_log_path):
+    """Compare the cloud modlist entries with the installed mods and return an UpdatePlan without touching any file."""
+    plan = UpdatePlan()
+    update_all = config.get("updateAll", False)
+
+    for mod_id, mod_data in cloud_mods.items():
+        cloud_filename = mod_data['filename']
+        cloud_version = mod_data['version']
+        cloud_sha256 = mod_data.get('sha256')
+        # Any download installs the current forced rebuild, so it records the sequence and keys the mod store by it
+        cloud_sequence = core.get_cloud_force_update(mod_id) or None
+
+        if mod_id not in installed_mods:
+            plan.download(mod_id, mod_data, "new mod", cloud_sequence)
+            continue
+
+        local_filenames = installed_mods[mod_id][0]  # List of installed filenames for this mod ID
+        local_versions = installed_mods[mod_id][1]  # List of installed versions of this mod ID
+        local_hashes = installed_mods[mod_id][2]  # List of installed content hashes of this mod ID
+
+        if cloud_sha256 and not update_all:
+            # The modlist publishes a content hash: freshness is decided by content alone,
+            # and bytes matching it already contain any forced rebuild
+            matching_files = [local_filenames[i] for i, file_hash in enumerate(local_hashes) if file_hash == cloud_sha256]
+            kept_file = cloud_filename if cloud_filename in matching_files else (matching_files[0] if matching_files else None)
+            for local_filename in local_filenames:
+                if local_filename != kept_file:
+                    plan.remove(mod_id, local_filename, "duplicate of the same content" if local_filename in matching_files else "content differs from the published hash")
+            if kept_file:
+                plan.keep(mod_id, kept_file, "content matches the published hash", cloud_sequence)
+            else:
+                plan.download(mod_id, mod_data, "content differs from the published hash", cloud_sequence)
+            continue
+
+        if config.get("useVersionChecking", True) and not update_all:
+            versionmatching_files = [local_filenames[i] for i, version in enumerate(local_versions) if version == cloud_version]
+            for i, version in enumerate(local_versions):
+                if version != cloud_version:
+                    plan.remove(mod_id, local_filenames[i], f"outdated version {version} (cloud: {cloud_version})")
+
+            if not versionmatching_files:
+                plan.download(mod_id, mod_data, f"update to version {cloud_version}", cloud_sequence)
+                continue
+
+            # Prefer keeping the one with the cloud filename, otherwise keep the newest
+            versionmatching_files.sort(key=lambda f: (f != cloud_filename, -os.path.getmtime(os.path.join(mods_path, f))))
+            kept_file = versionmatching_files[0]
+            for duplicated_file in versionmatching_files[1:]:
+                plan.remove(mod_id, duplicated_file, "duplicate of the same version")
+
+            sequence, forced = _force_update_state(mod_id, force_update_log_path)
+            if forced:
+                plan.remove(mod_id, kept_file, "cloud force update")
+                plan.download(mod_id, mod_data, "cloud force update", sequence)
+            else:
+                plan.keep(mod_id, kept_file, "version matches", sequence)
+            continue
+
+        # If not using version checking, check filename mismatch
+        for local_filename in local_filenames:
+            if local_filename != cloud_filename:
+                plan.remove(mod_id, local_filename, "filename differs from the modlist")
+
+        if update_all:
+            plan.download(mod_id, mod_data, "updateAll is enabled", cloud_sequence)
+        elif cloud_filename not in local_filenames:
+            plan.download(mod_id, mod_data, "filename differs from the modlist", cloud_sequence)
+        else:
+            sequence, forced = _force_update_state(mod_id, force_update_log_path)
+            if forced:
+                plan.download(mod_id, mod_data, "cloud force update", sequence)
+            else:
+                plan.keep(mod_id, cloud_filename, "filename matches", sequence)
+
+    return plan
+
+
+def print_plan(plan, dry_run=False):
+    """Print the planned actions, most relevant first."""
+    prefix = "Would " if dry_run else ""
+    for action in plan.actions():
+        if action["action"] == "keep":
+            print(f"{action['mod_id']} ({action['filename']}) is already up-to-date.")
+        elif action["action"] == "remove":
+            print(colored.yellow(f"{prefix}{'remove' if dry_run else 'Removing'} {action['filename']} ({action['reason']})"))
+        else:
+            print(colored.cyan(f"{prefix}{'download' if dry_run else 'Downloading'} {action['filename']} for {action['mod_id']} ({action['reason']})"))
+    summary = plan.summary()
+    print(f"Plan: {summary['download']} to download, {summary['remove']} to remove, {summary['keep']} up-to-date")
+
+
+def execute_plan(plan, mods_path, config, force_update_log):
+    """Run a plan: remove files, download everything in one batch, then record force updates.
+
+    force_update_log is updated in place; sequences of downloaded mods are only recorded if the
+    download succeeded. Returns the list of failed download actions.
+    """
+    actions = plan.actions()
+    for action in actions:
+        if action["action"] == "remove":
+            core.removeWithCheck(os.path.join(mods_path, action["filename"]), "", f"File {action['filename']} not found, skipping deletion.")
+
+    download_actions = [action for action in actions if action["action"] == "download"]
+    failed_mods = core.download_mods([core.with_force_sequence(action["mod_id"], action["mod_data"]) for action in download_actions], mods_path,
+                                     config.get("downloadWorkers", core.DEFAULT_DOWNLOAD_WORKERS), config.get("downloadRetries", core.DEFAULT_DOWNLOAD_RETRIES))
+    failed_keys = {(mod_data['filename'], mod_data['environment']) for mod_data in failed_mods}
+    failed_actions = [action for action in download_actions if (action["filename"], action["environment"]) in failed_keys]
+
+    for action in actions:
+        if action["action"] == "remove" or not action.get("force_sequence"):
+            continue
+        if action["action"] == "download" and action in failed_actions:
+            continue
+        force_update_log[action["mod_id"]] = action["force_sequence"]
+    return failed_actions